@@ -0,0 +1,91 @@
+# Stand-in for ffprobe and ffmpeg serving media files written by
+# benchmarks.synthetic.fake_video, called as: fake_ffmpeg.py ffprobe|ffmpeg ARGS
+import json
+import os
+import sys
+from pathlib import Path
+
+import srt
+
+
+def probe(args):
+    media = json.loads(Path(args[-1]).read_text())
+    print(json.dumps({"streams": media["streams"]}))
+
+
+def extract(args):
+    media = json.loads(Path(args[args.index("-i") + 1]).read_text())
+    # ffmpeg-python puts each output's "-map 0:N" right before its target
+    outputs = [
+        (args[i - 1].split(":")[1], target)
+        for i, target in enumerate(args)
+        if i >= 2 and args[i - 2] == "-map"
+    ]
+    for track, target in outputs:
+        data = seek(args, media["tracks"][track]).encode()
+        if target.startswith("pipe:"):
+            fd = int(target.split(":")[1])
+            with os.fdopen(fd, "wb") as output:
+                output.write(data)
+        else:
+            Path(target).write_bytes(data)
+
+
+def seek(args, text):
+    # input seeking with -copyts: cues outside -ss and -t are left out
+    if "-ss" not in args and "-t" not in args:
+        return text
+    start = float(args[args.index("-ss") + 1]) if "-ss" in args else 0.0
+    end = start + float(args[args.index("-t") + 1]) if "-t" in args else None
+    cues = [
+        cue
+        for cue in srt.parse(text)
+        if cue.end.total_seconds() > start
+        and (end is None or cue.start.total_seconds() < end)
+    ]
+    return srt.compose(cues, reindex=False)
+
+
+def remux(args):
+    # stream copy of the first input with the other inputs' SRT appended
+    inputs = [args[i + 1] for i, arg in enumerate(args) if arg == "-i"]
+    media = json.loads(Path(inputs[0]).read_text())
+    maps = [args[i + 1] for i, arg in enumerate(args) if arg == "-map"]
+    dropped = {int(m.split(":")[1]) for m in maps if m.startswith("-0:")}
+    metadata = {}
+    for i, arg in enumerate(args):
+        if arg.startswith("-metadata:s:s:"):
+            key, value = args[i + 1].split("=", 1)
+            metadata.setdefault(int(arg.split(":")[-1]), {})[key] = value
+    streams, tracks = [], {}
+    kept = [s for s in media["streams"] if s["index"] not in dropped]
+    for stream in kept:
+        tracks[len(streams) + 1] = media["tracks"][str(stream["index"])]
+        streams.append({**stream, "index": len(streams) + 1})
+    for path in inputs[1:]:
+        tags = metadata.get(len(streams), {})
+        tracks[len(streams) + 1] = Path(path).read_text()
+        streams.append(
+            {"index": len(streams) + 1, "codec_name": "subrip", "tags": tags}
+        )
+    Path(args[-1]).write_text(json.dumps({"streams": streams, "tracks": tracks}))
+
+
+def install(bin_dir: Path) -> Path:
+    for tool in ("ffprobe", "ffmpeg"):
+        wrapper = bin_dir / tool
+        wrapper.write_text(
+            f'#!/bin/sh\nexec "{sys.executable}" "{__file__}" {tool} "$@"\n'
+        )
+        wrapper.chmod(0o755)
+    return bin_dir
+
+
+if __name__ == "__main__":
+    tool, args = sys.argv[1], sys.argv[2:]
+    if tool == "ffprobe":
+        probe(args)
+    elif args.count("-i") > 1:
+        remux(args)
+    else:
+        extract(args)
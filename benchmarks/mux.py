@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from benchmarks.suite import best_time, peak_memory, wall_time
+from benchmarks.synthetic import synthetic_track
+from dualsrt.mux import (
+    COMBINE_ENGINES,
+    align_cues,
+    align_subtitles,
+    chunked_subtitles,
+    combine_cues,
+    combine_subtitles,
+    cues,
+    dual_subtitles,
+    to_us,
+)
+
+MIN_LEN = timedelta(milliseconds=900)
+
+
+def run_dual(primary, secondary):
+    for _ in dual_subtitles(primary, secondary, {}, {"color": "gray"}):
+        pass
+
+
+def run_chunked(primary, secondary, pool, chunks):
+    for _ in chunked_subtitles(
+        [primary, secondary], [{}, {"color": "gray"}], pool, chunks
+    ):
+        pass
+
+
+def run_combine(primary, secondary, engine):
+    for _ in COMBINE_ENGINES[engine](cues(primary), cues(secondary)):
+        pass
+
+
+def subtitle_segments(primary, secondary):
+    return list(align_subtitles(combine_subtitles(primary, secondary), MIN_LEN))
+
+
+def cue_segments(primary, secondary):
+    return list(
+        align_cues(combine_cues(cues(primary), cues(secondary)), to_us(MIN_LEN))
+    )
+
+
+def main(count=20000):
+    primary = synthetic_track(count, 1, "p")
+    secondary = synthetic_track(count, 2, "s")
+    print(f"{count} cues per track")
+    for engine in COMBINE_ENGINES:
+        elapsed = best_time(run_combine, primary, secondary, engine) * 1000
+        print(f"  combine ({engine} engine): {elapsed:.1f} ms")
+    print(f"  dual_subtitles: {best_time(run_dual, primary, secondary) * 1000:.1f} ms")
+    chunks = os.cpu_count() or 1
+    with ProcessPoolExecutor(chunks) as pool:
+        elapsed = wall_time(run_chunked, primary, secondary, pool, chunks) * 1000
+    print(f"  dual_subtitles in {chunks} chunks: {elapsed:.1f} ms wall time")
+    for name, func in (("Subtitle", subtitle_segments), ("Cue", cue_segments)):
+        elapsed = best_time(func, primary, secondary, repeat=5) * 1000
+        peak = peak_memory(func, primary, secondary) / 1024 / 1024
+        print(f"  {name} segments: {elapsed:.1f} ms, {peak:.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import srt
+
+from benchmarks.suite import best_time
+from benchmarks.synthetic import synthetic_track
+from dualsrt.cli import write_subtitles
+from dualsrt.srtio import parse, write_srt
+
+
+def srt_parse(text):
+    return list(srt.parse(text))
+
+
+def builtin_parse(text):
+    return list(parse(text))
+
+
+def builtin_parse_bytes(data):
+    return list(parse(memoryview(data)))
+
+
+def srt_write(path, subs):
+    with path.open("w") as output:
+        write_subtitles(output, subs)
+
+
+def main(count=50000):
+    subs = synthetic_track(count, 1, "line")
+    text = srt.compose(subs)
+    print(f"{count} cues, {len(text) / 1024:.0f} KiB")
+    for name, func, data in (
+        ("srt.parse", srt_parse, text),
+        ("srtio.parse(str)", builtin_parse, text),
+        ("srtio.parse(bytes)", builtin_parse_bytes, text.encode()),
+    ):
+        print(f"  {name}: {best_time(func, data, repeat=5) * 1000:.1f} ms")
+    with TemporaryDirectory() as tmp_dir:
+        output = Path(tmp_dir) / "out.srt"
+        for name, func in (
+            ("to_srt writer", srt_write),
+            ("srtio.write_srt", write_srt),
+        ):
+            elapsed = best_time(func, output, subs, repeat=5) * 1000
+            print(f"  {name}: {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmarks.fake_ffmpeg import install
+from benchmarks.synthetic import fake_video, synthetic_pair
+from dualsrt.cli import produce_dual_subtitles
+from dualsrt.mux import align_subtitles, combine_subtitles, dual_subtitles, overlaps
+
+MIN_LEN = timedelta(milliseconds=900)
+
+
+def best_time(func, *args, repeat=10):
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        func(*args)
+        timings.append(time.process_time() - started)
+    return min(timings)
+
+
+def wall_time(func, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def micro_benchmarks(count: int) -> dict:
+    primary, secondary = synthetic_pair(count, 1)
+    stacked = synthetic_pair(count, 1, overlap=0.2)
+    pairs = list(zip(primary, secondary))
+    combined = list(combine_subtitles(primary, secondary))
+    benchmarks = {
+        "overlaps": lambda: [overlaps(p, s) for p, s in pairs],
+        "combine_subtitles": lambda: list(combine_subtitles(primary, secondary)),
+        "align_subtitles": lambda: list(align_subtitles(combined, MIN_LEN)),
+        "dual_subtitles": lambda: list(
+            dual_subtitles(primary, secondary, {}, {"color": "gray"})
+        ),
+        "dual_subtitles[overlapping]": lambda: list(
+            dual_subtitles(*stacked, {}, {"color": "gray"})
+        ),
+    }
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        benchmarks["combine_subtitles[numpy]"] = lambda: list(
+            combine_subtitles(primary, secondary, engine="numpy")
+        )
+    return benchmarks
+
+
+def end_to_end(tmp_dir: Path, count: int, files: int) -> dict:
+    videos = []
+    for idx in range(files):
+        eng = synthetic_pair(count, idx * 10)[0]
+        rus = synthetic_pair(count, idx * 10 + 5)
+        videos.append(
+            fake_video(tmp_dir / f"video{idx}.mkv", {"eng": [eng], "rus": rus})
+        )
+
+    def produce(**options):
+        # forced, or every run after the first is skipped as up to date
+        for video in videos:
+            produce_dual_subtitles(
+                video,
+                primary_lang="eng",
+                secondary_lang="rus",
+                output_language=None,
+                primary_font={},
+                secondary_font={"color": "gray"},
+                force=True,
+                **options,
+            )
+
+    return {
+        "produce_dual_subtitles": produce,
+        "produce_dual_subtitles[builtin]": lambda: produce(srt_io="builtin"),
+    }
+
+
+def git_commit() -> str:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    )
+    return result.stdout.strip() or "unknown"
+
+
+def run(count: int, files: int, repeat: int) -> dict:
+    results = {}
+    for name, func in micro_benchmarks(count).items():
+        results[name] = {
+            "seconds": best_time(func, repeat=repeat),
+            "peak_bytes": peak_memory(func),
+        }
+        print(f"{name}: {results[name]['seconds'] * 1000:.1f} ms")
+    with TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        bin_dir = tmp_dir / "bin"
+        bin_dir.mkdir()
+        path = os.environ["PATH"]
+        os.environ["PATH"] = f"{install(bin_dir)}{os.pathsep}{path}"
+        try:
+            for name, func in end_to_end(tmp_dir, count, files).items():
+                results[name] = {"seconds": wall_time(func, repeat=max(repeat // 3, 1))}
+                print(f"{name}: {results[name]['seconds'] * 1000:.1f} ms")
+        finally:
+            os.environ["PATH"] = path
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cues": count,
+        "files": files,
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict):
+    print(f"\n{baseline['commit']} -> {report['commit']}")
+    for name, result in report["results"].items():
+        if name in baseline["results"]:
+            old = baseline["results"][name]["seconds"]
+            new = result["seconds"]
+            print(f"{name}: {old * 1000:.1f} -> {new * 1000:.1f} ms ({new / old:.2f}x)")
+
+
+def main():
+    parser = ArgumentParser(description="dualsrt benchmark suite")
+    parser.add_argument("--cues", type=int, default=5000, help="cues per track")
+    parser.add_argument("--files", type=int, default=4, help="end-to-end videos")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare to")
+    args = parser.parse_args()
+    report = run(args.cues, args.files, args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
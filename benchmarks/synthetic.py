@@ -0,0 +1,69 @@
+import json
+import random
+from datetime import timedelta
+from pathlib import Path
+
+import srt
+from srt import Subtitle
+
+
+def synthetic_track(
+    count: int,
+    seed: int,
+    prefix: str = "line",
+    density=0.6,
+    duplicates=0.2,
+    short=0.05,
+    overlap=0.0,
+) -> list[Subtitle]:
+    # density is the share of the timeline covered by cues, duplicates the
+    # chance a cue repeats the previous content, short the chance of a cue
+    # below align_subtitles' default 900ms min_len and overlap the chance the
+    # next cue starts while this one is still on screen
+    rng = random.Random(seed)
+    subs = []
+    start = rng.randint(0, 2000)
+    content = f"{prefix} 0"
+    for idx in range(1, count + 1):
+        if rng.random() < short:
+            length = rng.randint(50, 900)
+        else:
+            length = rng.randint(901, 5000)
+        if rng.random() >= duplicates:
+            content = f"{prefix} {idx}"
+            if rng.random() < 0.3:
+                content += f"\n{prefix} {idx} second line"
+        subs.append(
+            Subtitle(
+                idx,
+                timedelta(milliseconds=start),
+                timedelta(milliseconds=start + length),
+                content,
+            )
+        )
+        if overlap and rng.random() < overlap:
+            start += rng.randint(0, length - 1)
+            continue
+        gap = int(length * (1 - density) / density) if density < 1 else 0
+        start += length + rng.randint(0, 2 * gap)
+    return subs
+
+
+def synthetic_pair(count: int, seed: int, **options) -> tuple[list, list]:
+    return (
+        synthetic_track(count, seed, "primary", **options),
+        synthetic_track(count, seed + 1, "secondary", **options),
+    )
+
+
+def fake_video(path: Path, tracks: dict[str, list[list[Subtitle]]]) -> Path:
+    # media file understood by fake_ffmpeg: stream metadata plus SRT text
+    streams, texts = [], {}
+    for language, language_tracks in tracks.items():
+        for subs in language_tracks:
+            index = len(streams) + 1
+            tags = {"language": language}
+            streams.append({"index": index, "codec_name": "subrip", "tags": tags})
+            texts[index] = srt.compose(subs)
+    path.write_text(json.dumps({"streams": streams, "tracks": texts}))
+    return path
@@ -0,0 +1,96 @@
+import json
+import os
+from hashlib import sha256
+from pathlib import Path
+from shutil import rmtree
+from typing import Optional
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# the running total size of the entries, so that a store needn't stat them all
+SIZE_FILE = ".size"
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "dualsrt"
+
+
+def fingerprint(file: Path) -> str:
+    stat = os.stat(file)
+    key = f"{Path(file).resolve()}\0{stat.st_size}\0{stat.st_mtime_ns}\0{stat.st_ino}"
+    return sha256(key.encode()).hexdigest()
+
+
+class SubtitleCache:
+    def __init__(self, directory: Path, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def load_probe(self, file: Path) -> Optional[dict]:
+        text = self._load(file, "probe.json")
+        return None if text is None else json.loads(text)
+
+    def store_probe(self, file: Path, probe: dict):
+        self._store(file, "probe.json", json.dumps(probe))
+
+    def load_track(self, file: Path, track: int) -> Optional[str]:
+        return self._load(file, f"{track}.srt")
+
+    def store_track(self, file: Path, track: int, text: str):
+        self._store(file, f"{track}.srt", text)
+
+    def evict(self):
+        entries = []
+        for entry in self.directory.iterdir():
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+            except (FileNotFoundError, NotADirectoryError):
+                continue  # removed by a concurrent run or not an entry
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            rmtree(entry, ignore_errors=True)
+            total -= size
+        self._write_size(total)
+
+    def _read_size(self) -> Optional[int]:
+        try:
+            return int((self.directory / SIZE_FILE).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_size(self, total: int):
+        # concurrent runs may lose each other's updates, the total is only
+        # exact again after the next evict counts every entry
+        tmp = self.directory / f"{SIZE_FILE}.{os.getpid()}"
+        tmp.write_text(str(total))
+        tmp.replace(self.directory / SIZE_FILE)
+
+    def _load(self, file: Path, name: str) -> Optional[str]:
+        entry = self.directory / fingerprint(file)
+        try:
+            text = (entry / name).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        os.utime(entry)
+        return text
+
+    def _store(self, file: Path, name: str, text: str):
+        entry = self.directory / fingerprint(file)
+        entry.mkdir(parents=True, exist_ok=True)
+        tmp = entry / f".{name}.{os.getpid()}"
+        tmp.write_text(text, encoding="utf-8")
+        added = tmp.stat().st_size
+        try:
+            added -= (entry / name).stat().st_size
+        except FileNotFoundError:
+            pass
+        tmp.replace(entry / name)
+        os.utime(entry)
+        total = self._read_size()
+        if total is None or total + added > self.max_size:
+            self.evict()
+        else:
+            self._write_size(total + added)
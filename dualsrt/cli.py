@@ -1,10 +1,28 @@
+import sys
+from os import cpu_count
 from pathlib import Path
 import srt
-from .mux import dual_subtitles
-from .extract import find_subtitles, extract_subtitle_tracks
+from .mux import (
+    COMBINE_ENGINES,
+    DEFAULT_MIN_LEN,
+    chunked_subtitles,
+    stacked_subtitles,
+    clip_window,
+    prepare_cues,
+    window_cues,
+)
+from .srtio import PARSERS, numbered, read_text, write_srt
+from .sync import SYNC_MODES, sync_cues
+from .stats import NO_STATS, Stats
+from .manifest import options_hash, up_to_date, write_manifest
+from .cache import DEFAULT_MAX_SIZE, SubtitleCache, default_cache_dir, fingerprint
+from .lease import CLAIMED_ELSEWHERE, DEFAULT_LEASE_TTL, claim, shard_order
+from contextlib import nullcontext
 from itertools import product
 from re import sub
 from argparse import ArgumentParser, ArgumentTypeError
+from datetime import timedelta
+from typing import Iterable, Optional, Sequence, TextIO, Union
 
 
 def existing_file_path(path_str):
@@ -15,12 +33,224 @@ def existing_file_path(path_str):
         return path
 
 
+def job_count(text):
+    jobs = int(text)
+    if jobs < 0:
+        raise ArgumentTypeError(f"invalid job count {text}")
+    return jobs or cpu_count() or 1
+
+
+def shard_spec(text):
+    # i/N with shards counted from 1
+    try:
+        index, count = (int(number) for number in text.split("/"))
+    except ValueError:
+        raise ArgumentTypeError(f"invalid shard {text}, expected i/N")
+    if not 1 <= index <= count:
+        raise ArgumentTypeError(f"invalid shard {text}, expected 1 <= i <= N")
+    return index - 1, count
+
+
+def lease_ttl(text):
+    # renewal runs every ttl / 3 seconds, so the ttl must be positive
+    try:
+        ttl = float(text)
+    except ValueError:
+        raise ArgumentTypeError(f"invalid lease ttl {text}")
+    if not 0 < ttl < float("inf"):
+        raise ArgumentTypeError(f"invalid lease ttl {text}, expected seconds > 0")
+    return ttl
+
+
 def font_attributes(text):
     pairs = [entry.split(":") for entry in text.split(",") if entry]
     attributes = {attr: value for attr, value in pairs}
     return attributes
 
 
+def time_offset(text):
+    # seconds, MM:SS or HH:MM:SS, each with optional fractions of a second
+    parts = text.split(":")
+    try:
+        if len(parts) > 3:
+            raise ValueError(text)
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+        if not seconds >= 0:
+            raise ValueError(text)
+        return timedelta(seconds=seconds)
+    except (ValueError, OverflowError):
+        raise ArgumentTypeError(f"invalid time {text}")
+
+
+def window_label(start: Optional[timedelta], end: Optional[timedelta]) -> str:
+    # 600-900, 0-90.5 or 600-end, part of the output name
+    start = f"{start.total_seconds():g}" if start else "0"
+    end = "end" if end is None else f"{end.total_seconds():g}"
+    return f"{start}-{end}"
+
+
+def language_pairs(primary_lang: str, secondary_lang: str) -> list[tuple[str, str]]:
+    # comma-separated languages: "eng" and "rus,ukr" pair eng+rus and eng+ukr
+    return [
+        (primary, secondary)
+        for primary in primary_lang.split(",")
+        for secondary in secondary_lang.split(",")
+        if primary != secondary
+    ]
+
+
+def language_sets(
+    primary_lang: str, secondary_lang: str, extra_languages: Sequence[str] = ()
+) -> list[tuple[str, ...]]:
+    # each pair followed by the extra languages shown under the secondary one
+    return [
+        (*pair, *(language for language in extra_languages if language not in pair))
+        for pair in language_pairs(primary_lang, secondary_lang)
+    ]
+
+
+def pair_languages(pairs: list[tuple[str, str]]) -> list[str]:
+    return list(dict.fromkeys(language for pair in pairs for language in pair))
+
+
+def produce_options(
+    *options,
+    window=None,
+    keep_times=False,
+    sync=None,
+    sidecars=None,
+    extra_languages=(),
+    extra_fonts=(),
+) -> str:
+    # languages, output language, fonts and embedding; the optional settings
+    # only count once used, keeping earlier manifests valid
+    extra = {}
+    if window:
+        extra["window"] = [*window, keep_times]
+    if sync:
+        extra["sync"] = sync
+    if sidecars:
+        extra["sidecars"] = {
+            language: fingerprint(path) for language, path in sidecars.items()
+        }
+    if extra_languages:
+        extra["extra_languages"] = [list(extra_languages), list(extra_fonts)]
+    return options_hash(*options, DEFAULT_MIN_LEN, *([extra] if extra else []))
+
+
+def sidecar_files(
+    video: Path, languages: list[str], sidecars: Union[None, str, dict]
+) -> dict[str, Path]:
+    # sidecars given as {language: path} or, with "auto", the existing
+    # <video stem>.<language>.srt files
+    if not sidecars:
+        return {}
+    if sidecars == "auto":
+        found = {
+            lang: video.with_name(f"{video.stem}.{lang}.srt") for lang in languages
+        }
+        return {lang: path for lang, path in found.items() if path.is_file()}
+    return {lang: Path(path) for lang, path in sidecars.items() if lang in languages}
+
+
+def sidecar_stream(language: str, path: Path) -> dict:
+    # stands in for a probed stream; the path is its index in all_subs
+    return {"index": str(path), "codec_name": "subrip", "tags": {"language": language}}
+
+
+def sidecar_streams(sidecar_paths: dict[str, Path]) -> dict[str, list[dict]]:
+    return {lang: [sidecar_stream(lang, path)] for lang, path in sidecar_paths.items()}
+
+
+def read_sidecars(
+    video: Path, sidecar_paths: dict[str, Path], srt_io: str, stats: Stats = NO_STATS
+) -> dict[str, list]:
+    # parsed sidecar files keyed by their streams' index
+    with stats.stage(video, "sidecar") as record:
+        parse = stats.parser(video, PARSERS[srt_io], inside=record)
+        subs = {
+            str(path): list(parse(read_text(path))) for path in sidecar_paths.values()
+        }
+        record["cues_out"] = sum(map(len, subs.values()))
+    return subs
+
+
+def run_settings(
+    video: Path,
+    *,
+    primary_lang: str,
+    secondary_lang: str,
+    output_language: Optional[str],
+    primary_font: dict,
+    secondary_font: dict,
+    embed: bool = False,
+    start: Optional[timedelta] = None,
+    end: Optional[timedelta] = None,
+    keep_times: bool = False,
+    sync: Optional[str] = None,
+    sidecars: Union[None, str, dict] = None,
+    extra_languages: Sequence[str] = (),
+    extra_fonts: Sequence[dict] = (),
+) -> tuple:
+    # the window, the languages read from subtitle streams, the sidecar files
+    # and the options hash of producing the video's dual subtitles
+    window = None if start is None and end is None else (start, end)
+    if window and embed:
+        raise ValueError("embedding needs whole subtitle tracks, not a time window")
+    languages = pair_languages(
+        language_sets(primary_lang, secondary_lang, extra_languages)
+    )
+    sidecar_paths = sidecar_files(video, languages, sidecars)
+    options = produce_options(
+        primary_lang,
+        secondary_lang,
+        output_language,
+        primary_font,
+        secondary_font,
+        embed,
+        window=window,
+        keep_times=keep_times,
+        sync=sync,
+        sidecars=sidecar_paths,
+        extra_languages=extra_languages,
+        extra_fonts=extra_fonts,
+    )
+    embedded = [language for language in languages if language not in sidecar_paths]
+    return window, embedded, sidecar_paths, options
+
+
+def known_tracks(
+    streams: Optional[dict[str, list[dict]]], embedded: list[str]
+) -> Optional[dict[str, list[dict]]]:
+    # streams selected by an earlier probe, such as a plan's, skip probing
+    # when they cover every language
+    if streams is not None and all(lang in streams for lang in embedded):
+        return {lang: streams[lang] for lang in embedded}
+    return None
+
+
+def finish_video(
+    video: Path,
+    options: str,
+    subtitle_tracks: dict[str, list[dict]],
+    outputs: list[Path],
+    *,
+    embed: bool = False,
+    cache: Optional[SubtitleCache] = None,
+    native: bool = False,
+    stats: Stats = NO_STATS,
+):
+    if embed and outputs:
+        from .embed import embed_subtitles
+
+        with stats.stage(video, "embed"):
+            embed_subtitles(video, outputs, cache, native)
+    all_tracks = [s["index"] for lang in subtitle_tracks.values() for s in lang]
+    write_manifest(video, options, all_tracks, outputs)
+
+
 def produce_dual_subtitles(
     video: Path,
     primary_lang: str,
@@ -28,44 +258,327 @@ def produce_dual_subtitles(
     output_language: str,
     primary_font: dict,
     secondary_font: dict,
+    cache: Optional[SubtitleCache] = None,
+    native: bool = False,
+    engine: str = "python",
+    srt_io: str = "srt",
+    force: bool = False,
+    embed: bool = False,
+    start: Optional[timedelta] = None,
+    end: Optional[timedelta] = None,
+    keep_times: bool = False,
+    sync: Optional[str] = None,
+    sidecars: Union[None, str, dict] = None,
+    mux_chunks: int = 1,
+    extra_languages: Sequence[str] = (),
+    extra_fonts: Sequence[dict] = (),
+    stats: Stats = NO_STATS,
+    streams: Optional[dict[str, list[dict]]] = None,
 ):
-    subtitle_tracks = find_subtitles(video, (primary_lang, secondary_lang))
-    all_tracks = [s["index"] for lang in subtitle_tracks.values() for s in lang]
-    all_subs = extract_subtitle_tracks(video, *all_tracks)
-    combos = product(subtitle_tracks[primary_lang], subtitle_tracks[secondary_lang])
-    for primary, secondary in combos:
-        subs = all_subs[primary["index"]], all_subs[secondary["index"]]
-        dual = dual_subtitles(
-            *(srt.parse(s) for s in subs), primary_font, secondary_font
-        )
-        parts = (
-            "dual",
-            primary["tags"].get("title") or primary["tags"]["language"],
-            secondary["tags"].get("title") or secondary["tags"]["language"],
-        )
-        sfx = "_".join(sub(r"[^0-9a-z]+", "_", t.lower()) for t in parts)
-        dual_file = (
-            video.parent / f"{video.stem}.{output_language or primary_lang}.{sfx}.srt"
+    window, embedded, sidecar_paths, options = run_settings(
+        video,
+        primary_lang=primary_lang,
+        secondary_lang=secondary_lang,
+        output_language=output_language,
+        primary_font=primary_font,
+        secondary_font=secondary_font,
+        embed=embed,
+        start=start,
+        end=end,
+        keep_times=keep_times,
+        sync=sync,
+        sidecars=sidecars,
+        extra_languages=extra_languages,
+        extra_fonts=extra_fonts,
+    )
+    if not force and up_to_date(video, options):
+        return None
+    subtitle_tracks, all_subs = {}, {}
+    if embedded:
+        # ffmpeg is imported on first use, keeping --help and client mode quick
+        from .extract import (
+            find_subtitles,
+            extract_subtitle_tracks,
+            parse_subtitle_tracks,
         )
-        dual_file.write_text(srt.compose(dual))
+
+        with stats.stage(video, "probe") as record:
+            subtitle_tracks = known_tracks(streams, embedded)
+            if subtitle_tracks is None:
+                subtitle_tracks = find_subtitles(
+                    video, embedded, cache=cache, native=native
+                )
+            tracks = [s["index"] for lang in subtitle_tracks.values() for s in lang]
+            record["streams"] = len(tracks)
+        parse = PARSERS[srt_io]
+        with stats.stage(video, "extract") as record:
+            if cache:
+                extracted = extract_subtitle_tracks(
+                    video, *tracks, cache=cache, native=native, window=window
+                )
+                if stats.enabled:
+                    record["bytes_read"] = sum(
+                        len(t.encode()) for t in extracted.values()
+                    )
+            else:
+                # parsed while ffmpeg writes the tracks, outside the extract time
+                all_subs = parse_subtitle_tracks(
+                    video,
+                    *tracks,
+                    native=native,
+                    parse=stats.parser(video, parse, inside=record),
+                    window=window,
+                )
+        if cache:
+            parse_text = stats.parser(video, parse)
+            all_subs = {
+                track: list(parse_text(text)) for track, text in extracted.items()
+            }
+        record["cues_out"] = sum(len(subs) for subs in all_subs.values())
+    if sidecar_paths:
+        subtitle_tracks.update(sidecar_streams(sidecar_paths))
+        all_subs.update(read_sidecars(video, sidecar_paths, srt_io, stats))
+    outputs = write_dual_subtitles(
+        video,
+        subtitle_tracks,
+        all_subs,
+        primary_lang=primary_lang,
+        secondary_lang=secondary_lang,
+        output_language=output_language,
+        primary_font=primary_font,
+        secondary_font=secondary_font,
+        engine=engine,
+        srt_io=srt_io,
+        window=window,
+        keep_times=keep_times,
+        sync=sync,
+        mux_chunks=mux_chunks,
+        extra_languages=extra_languages,
+        extra_fonts=extra_fonts,
+        stats=stats,
+    )
+    finish_video(
+        video,
+        options,
+        subtitle_tracks,
+        outputs,
+        embed=embed,
+        cache=cache,
+        native=native,
+        stats=stats,
+    )
+    return outputs
 
 
-def main():
-    parser = ArgumentParser(description="Subtitle extraction and combining tool")
+def write_dual_subtitles(
+    video: Path,
+    subtitle_tracks: dict[str, list[dict]],
+    all_subs: dict[int, list],
+    *,
+    primary_lang: str,
+    secondary_lang: str,
+    output_language: str,
+    primary_font: dict,
+    secondary_font: dict,
+    engine: str = "python",
+    srt_io: str = "srt",
+    window: Optional[tuple[Optional[timedelta], Optional[timedelta]]] = None,
+    keep_times: bool = False,
+    sync: Optional[str] = None,
+    mux_chunks: int = 1,
+    extra_languages: Sequence[str] = (),
+    extra_fonts: Sequence[dict] = (),
+    stats: Stats = NO_STATS,
+) -> list[Path]:
+    with stats.stage(video, "normalize"):
+        if window:
+            all_subs = {
+                track: window_cues(subs, *window) for track, subs in all_subs.items()
+            }
+        all_subs = {track: prepare_cues(subs) for track, subs in all_subs.items()}
+    extra_font = dict(zip(extra_languages, extra_fonts))
+    sets = language_sets(primary_lang, secondary_lang, extra_languages)
+    outputs = []
+    with mux_pool(mux_chunks) as pool:
+        for languages, streams in stream_combos(subtitle_tracks, sets):
+            subs = [all_subs[stream["index"]] for stream in streams]
+            if sync:
+                with stats.stage(video, "sync"):
+                    subs[1:] = [sync_cues(subs[0], other, sync) for other in subs[1:]]
+            fonts = [primary_font, secondary_font]
+            fonts += [
+                extra_font.get(language, secondary_font) for language in languages[2:]
+            ]
+            if pool:
+                dual = chunked_subtitles(subs, fonts, pool, mux_chunks, engine=engine)
+            else:
+                dual = stacked_subtitles(subs, fonts, engine=engine)
+            if window:
+                dual = clip_window(dual, *window, keep_times)
+            language = output_language or languages[0]
+            dual_file = output_path(video, language, streams, window)
+            with stats.stage(video, "write") as record:
+                stats.add(video, "mux", cues_in=sum(map(len, subs)))
+                dual = stats.timed(video, "mux", dual, inside=record)
+                if srt_io == "builtin":
+                    write_srt(dual_file, dual)
+                else:
+                    with dual_file.open("w") as output:
+                        write_subtitles(output, dual)
+                if stats.enabled:
+                    record["bytes_written"] = (
+                        record.get("bytes_written", 0) + dual_file.stat().st_size
+                    )
+            outputs.append(dual_file)
+    return outputs
+
+
+def stream_combos(
+    subtitle_tracks: dict[str, list[dict]], sets: list[tuple[str, ...]]
+) -> list[tuple[tuple[str, ...], tuple[dict, ...]]]:
+    # every choice of one stream per language of each language set
+    return [
+        (languages, streams)
+        for languages in sets
+        for streams in product(*(subtitle_tracks[language] for language in languages))
+    ]
+
+
+def output_path(
+    video: Path,
+    language: str,
+    streams: Sequence[dict],
+    window: Optional[tuple[Optional[timedelta], Optional[timedelta]]] = None,
+) -> Path:
+    parts = [
+        stream["tags"].get("title") or stream["tags"]["language"] for stream in streams
+    ]
+    sfx = "_".join(sub(r"[^0-9a-z]+", "_", t.lower()) for t in ["dual", *parts])
+    if window:
+        sfx += f".{window_label(*window)}"
+    return video.parent / f"{video.stem}.{language}.{sfx}.srt"
+
+
+def mux_pool(chunks: int):
+    # worker processes for chunks of one track pair, none without chunking
+    if chunks < 2:
+        return nullcontext()
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(chunks)
+
+
+def write_subtitles(output: TextIO, subtitles: Iterable[srt.Subtitle]):
+    # same output as srt.compose
+    for index, subtitle in numbered(subtitles):
+        subtitle.index = index
+        output.write(subtitle.to_srt())
+
+
+def run_batch(
+    videos,
+    jobs: int,
+    arguments: dict,
+    stats: Stats = NO_STATS,
+    lease_ttl: Optional[float] = None,
+    streams: Optional[dict[Path, dict]] = None,
+) -> list[tuple[Path, Optional[str]]]:
+    # arguments are keyword arguments of produce_dual_subtitles; with a
+    # lease_ttl, videos claimed by other nodes are left out of the results;
+    # streams holds the streams already selected for some videos
+    streams = streams or {}
+    if jobs > 1 and len(videos) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(min(jobs, len(videos))) as pool:
+            futures = [
+                pool.submit(
+                    produce_in_worker,
+                    video,
+                    stats.enabled,
+                    arguments,
+                    lease_ttl=lease_ttl,
+                    streams=streams.get(video),
+                )
+                for video in videos
+            ]
+            results = []
+            for video, future in zip(videos, futures):
+                error, files = future.result()
+                stats.merge(files)
+                results.append((video, error))
+    else:
+        results = [
+            (
+                video,
+                try_produce(
+                    video,
+                    arguments,
+                    stats=stats,
+                    lease_ttl=lease_ttl,
+                    streams=streams.get(video),
+                ),
+            )
+            for video in videos
+        ]
+    return [(video, error) for video, error in results if error != CLAIMED_ELSEWHERE]
+
+
+def produce_in_worker(
+    video: Path, collect_stats: bool, arguments: dict, lease_ttl=None, streams=None
+):
+    # worker stats travel back with the result and are merged by run_batch
+    stats = Stats() if collect_stats else NO_STATS
+    error = try_produce(
+        video, arguments, stats=stats, lease_ttl=lease_ttl, streams=streams
+    )
+    return error, stats.files
+
+
+def try_produce(
+    video: Path,
+    arguments: dict,
+    stats: Stats = NO_STATS,
+    lease_ttl: Optional[float] = None,
+    streams: Optional[dict[str, list[dict]]] = None,
+) -> Optional[str]:
+    # errors are reported as text: ffmpeg.Error can't cross process boundaries
+    try:
+        with claim(video, lease_ttl) as claimed:
+            if not claimed:
+                return CLAIMED_ELSEWHERE
+            with stats.stage(video, "total"):
+                produce_dual_subtitles(video, **arguments, stats=stats, streams=streams)
+    except Exception as error:
+        return f"{type(error).__name__}: {error}"
+
+
+def print_result(video: Path, error: Optional[str]):
+    status = f"FAILED: {error}" if error else "ok"
+    print(f"{video}: {status}", file=sys.stderr)
+
+
+def print_summary(results: list[tuple[Path, Optional[str]]]):
+    for video, error in results:
+        print_result(video, error)
+    failed = sum(1 for _, error in results if error)
+    print(f"{len(results) - failed} succeeded, {failed} failed", file=sys.stderr)
+
+
+def add_language_arguments(parser: ArgumentParser):
     parser.add_argument(
         "primary_language",
-        help="primary subtitle stream language (the one you learn)",
+        help="primary subtitle stream language (the one you learn), or several "
+        "comma-separated ones",
     )
     parser.add_argument(
         "secondary_language",
-        help="secondary subtitle stream language (the one you understand)",
-    )
-    parser.add_argument(
-        "video_file",
-        nargs="+",
-        type=existing_file_path,
-        help="video file with both subtitle streams",
+        help="secondary subtitle stream language (the one you understand), or "
+        "several comma-separated ones, each paired with every primary language",
     )
+
+
+def add_produce_arguments(parser: ArgumentParser):
     parser.add_argument(
         "--primary-font",
         type=font_attributes,
@@ -78,18 +591,340 @@ def main():
         default="color:gray",
         help='comma-separated font attributes of secondary titles (default: "color:gray")',
     )
+    parser.add_argument(
+        "--extra-language",
+        action="append",
+        default=[],
+        metavar="LANGUAGE",
+        help="another subtitle stream language shown under the secondary one, "
+        "repeat for more",
+    )
+    parser.add_argument(
+        "--extra-font",
+        action="append",
+        type=font_attributes,
+        default=[],
+        help="comma-separated font attributes of the extra languages' titles, in "
+        "the same order (default: the secondary font)",
+    )
     parser.add_argument(
         "--output-language",
         help="combined subtitle language (default is same as primary)",
     )
-    args = parser.parse_args()
-    for video_file in args.video_file:
-        produce_dual_subtitles(
-            video_file,
-            args.primary_language,
-            args.secondary_language,
-            args.output_language,
-            args.primary_font,
-            args.secondary_font,
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=job_count,
+        default=1,
+        help="number of files processed in parallel, 0 means one per CPU (default: 1)",
+    )
+    add_cache_arguments(parser)
+    parser.add_argument(
+        "--native-mkv",
+        action="store_true",
+        help="read text subtitles of Matroska files directly, falling back to ffmpeg",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=COMBINE_ENGINES,
+        default="python",
+        help="subtitle combining engine, numpy needs the numpy package and index "
+        "looks each segment up in an interval index (default: python)",
+    )
+    parser.add_argument(
+        "--srt-io",
+        choices=PARSERS,
+        default="srt",
+        help="SRT parser and writer: the srt library or the builtin streaming one "
+        "(default: srt)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="produce subtitles even for videos whose outputs are up to date",
+    )
+    parser.add_argument(
+        "--embed",
+        action="store_true",
+        help="also add the dual subtitles to the video as new subtitle streams, "
+        "remuxing it once without re-encoding",
+    )
+    parser.add_argument(
+        "--sidecars",
+        action="store_const",
+        const="auto",
+        help="read <video name>.<language>.srt files next to the videos instead of "
+        "subtitle streams, which are only used for languages without such a file",
+    )
+    parser.add_argument(
+        "--sync",
+        choices=SYNC_MODES,
+        help="retime secondary subtitles to the primary ones: by a constant offset, "
+        "or by an offset and a frame rate drift; needs the numpy package",
+    )
+    parser.add_argument(
+        "--start",
+        type=time_offset,
+        help="only produce subtitles from this time on, in seconds or [HH:]MM:SS",
+    )
+    parser.add_argument(
+        "--end",
+        type=time_offset,
+        help="only produce subtitles up to this time, in seconds or [HH:]MM:SS",
+    )
+    parser.add_argument(
+        "--keep-times",
+        action="store_true",
+        help="keep the original timestamps of a --start/--end window instead of "
+        "starting it at zero",
+    )
+    parser.add_argument(
+        "--mux-chunks",
+        type=job_count,
+        default=1,
+        help="mux each subtitle pair in up to this many chunks in parallel, split "
+        "where neither track shows a cue, 0 means one per CPU (default: 1)",
+    )
+
+
+def check_produce_arguments(parser: ArgumentParser, args):
+    if args.start is not None and args.end is not None and args.end <= args.start:
+        parser.error("--end must be after --start")
+    if args.embed and (args.start is not None or args.end is not None):
+        parser.error("--embed can't be combined with --start or --end")
+    if len(args.extra_font) > len(args.extra_language):
+        parser.error("each --extra-font needs an --extra-language")
+
+
+def add_cache_arguments(parser: ArgumentParser):
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=default_cache_dir(),
+        help="directory for cached probe and extraction results (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_SIZE // 1024 // 1024,
+        help="cache size limit in megabytes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always probe and extract subtitles with ffmpeg",
+    )
+
+
+def subtitle_cache(args) -> Optional[SubtitleCache]:
+    if args.no_cache:
+        return None
+    return SubtitleCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def produce_arguments(args) -> dict:
+    # keyword arguments of produce_dual_subtitles besides the video
+    return {
+        "primary_lang": args.primary_language,
+        "secondary_lang": args.secondary_language,
+        "output_language": args.output_language,
+        "primary_font": args.primary_font,
+        "secondary_font": args.secondary_font,
+        "cache": subtitle_cache(args),
+        "native": args.native_mkv,
+        "engine": args.engine,
+        "srt_io": args.srt_io,
+        "force": args.force,
+        "embed": args.embed,
+        "start": args.start,
+        "end": args.end,
+        "keep_times": args.keep_times,
+        "sync": args.sync,
+        "sidecars": args.sidecars,
+        "mux_chunks": args.mux_chunks,
+        "extra_languages": args.extra_language,
+        "extra_fonts": args.extra_font,
+    }
+
+
+def job_fields(args) -> dict:
+    # the produce arguments as JSON job fields of dualsrt.serve
+    return {
+        "primary_language": args.primary_language,
+        "secondary_language": args.secondary_language,
+        "output_language": args.output_language,
+        "primary_font": args.primary_font,
+        "secondary_font": args.secondary_font,
+        "native_mkv": args.native_mkv,
+        "engine": args.engine,
+        "srt_io": args.srt_io,
+        "force": args.force,
+        "embed": args.embed,
+        "start": None if args.start is None else args.start.total_seconds(),
+        "end": None if args.end is None else args.end.total_seconds(),
+        "keep_times": args.keep_times,
+        "sync": args.sync,
+        "sidecars": args.sidecars,
+        "mux_chunks": args.mux_chunks,
+        "extra_languages": args.extra_language,
+        "extra_fonts": args.extra_font,
+    }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["watch"]:
+        from .watch import main as watch_main
+
+        return watch_main(argv[1:])
+    if argv[:1] == ["serve"]:
+        from .serve import main as serve_main
+
+        return serve_main(argv[1:])
+    if argv[:1] == ["plan"]:
+        from .plan import main as plan_main
+
+        return plan_main(argv[1:])
+    if argv[:1] == ["run"]:
+        from .plan import run_main
+
+        return run_main(argv[1:])
+    parser = ArgumentParser(description="Subtitle extraction and combining tool")
+    add_language_arguments(parser)
+    parser.add_argument(
+        "video_file",
+        nargs="+",
+        type=existing_file_path,
+        help="video file with both subtitle streams",
+    )
+    add_produce_arguments(parser)
+    parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        help="write per-file, per-stage timing and resource usage as JSON "
+        '("-" for standard output)',
+    )
+    parser.add_argument(
+        "--prometheus",
+        metavar="FILE",
+        type=Path,
+        help="also write the stage statistics as a Prometheus textfile",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="overlap probing, extraction and muxing of different files, muxing "
+        "up to --jobs files at once",
+    )
+    parser.add_argument(
+        "--probe-jobs",
+        type=job_count,
+        default=4,
+        help="concurrent probes with --pipeline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--extract-jobs",
+        type=job_count,
+        default=2,
+        help="concurrent extractions with --pipeline (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--primary-srt",
+        type=existing_file_path,
+        metavar="FILE",
+        help="read primary subtitles from this SRT file instead of the video",
+    )
+    parser.add_argument(
+        "--secondary-srt",
+        type=existing_file_path,
+        metavar="FILE",
+        help="read secondary subtitles from this SRT file instead of the video",
+    )
+    parser.add_argument(
+        "--shard",
+        type=shard_spec,
+        metavar="I/N",
+        help="only process the I-th of N parts of the videos, split by path the "
+        "same way on every node; with --claim the other parts follow",
+    )
+    parser.add_argument(
+        "--claim",
+        action="store_true",
+        help="take a lease file next to each video before processing it and skip "
+        "videos leased by other nodes sharing the library",
+    )
+    parser.add_argument(
+        "--lease-ttl",
+        type=lease_ttl,
+        default=DEFAULT_LEASE_TTL,
+        metavar="SECONDS",
+        help="leases not renewed for this long are taken over (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const="",
+        metavar="ADDRESS",
+        help="send the videos to a running 'dualsrt serve' at this Unix socket "
+        "path or loopback http://host:port (default: its default socket)",
+    )
+    args = parser.parse_args(argv)
+    check_produce_arguments(parser, args)
+    if args.primary_srt or args.secondary_srt:
+        if len(args.video_file) > 1:
+            parser.error("--primary-srt and --secondary-srt need a single video")
+        if "," in args.primary_language + args.secondary_language:
+            parser.error("--primary-srt and --secondary-srt need single languages")
+        # resolved since a server may run in another directory
+        args.sidecars = {
+            language: str(path.resolve())
+            for language, path in (
+                (args.primary_language, args.primary_srt),
+                (args.secondary_language, args.secondary_srt),
+            )
+            if path
+        }
+    if args.claim and (args.pipeline or args.server is not None):
+        parser.error("--claim doesn't support --pipeline or --server")
+    videos = args.video_file
+    if args.shard:
+        videos = shard_order(videos, *args.shard, rest=args.claim)
+    if args.server is not None:
+        from .serve import default_address, submit_all, tcp_address
+
+        if args.server.startswith("http://"):
+            try:
+                tcp_address(args.server)
+            except ValueError as error:
+                parser.error(str(error))
+        results = submit_all(
+            args.server or default_address(), videos, args.jobs, **job_fields(args)
+        )
+        print_summary(results)
+        return 1 if any(error for _, error in results) else 0
+    stats = Stats() if args.stats or args.prometheus else NO_STATS
+    if args.pipeline:
+        from .pipeline import run as run_pipeline
+
+        results = run_pipeline(
+            videos,
+            produce_arguments(args),
+            probe_jobs=args.probe_jobs,
+            extract_jobs=args.extract_jobs,
+            mux_jobs=args.jobs,
+            stats=stats,
+        )
+    else:
+        results = run_batch(
+            videos,
+            args.jobs,
+            produce_arguments(args),
+            stats=stats,
+            lease_ttl=args.lease_ttl if args.claim else None,
         )
-    return 0
+    print_summary(results)
+    if args.stats:
+        stats.write_json(args.stats)
+    if args.prometheus:
+        stats.write_prometheus(args.prometheus)
+    return 1 if any(error for _, error in results) else 0
@@ -0,0 +1,63 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import ffmpeg
+
+from .cache import SubtitleCache
+from .extract import EMBEDDED_TITLE_PREFIX, load_probe
+
+# containers that can't store SRT as is
+SUBTITLE_CODECS = {".m4v": "mov_text", ".mov": "mov_text", ".mp4": "mov_text"}
+
+
+def output_tags(video: Path, output: Path) -> tuple[str, str]:
+    # outputs are named <video stem>.<language>.<dual title>.srt
+    language, title = output.name[len(video.stem) + 1 : -len(".srt")].split(".", 1)
+    return language, title
+
+
+def embed_subtitles(
+    video: Path,
+    outputs: list[Path],
+    cache: Optional[SubtitleCache] = None,
+    native=False,
+):
+    # one stream copy remux into a temporary file that replaces the video;
+    # tracks embedded by an earlier run are replaced rather than duplicated
+    streams = load_probe(video, cache, native)["streams"]
+    previous = [
+        stream["index"]
+        for stream in streams
+        if stream.get("tags", {})
+        .get("title", "")
+        .lower()
+        .startswith(EMBEDDED_TITLE_PREFIX)
+    ]
+    kept = len(streams) - len(previous)
+    codec = SUBTITLE_CODECS.get(video.suffix.lower(), "copy")
+    args = ["ffmpeg", "-loglevel", "error", "-i", os.fspath(video)]
+    for output in outputs:
+        args += ["-i", os.fspath(output)]
+    args += ["-map", "0"]
+    for index in previous:
+        args += ["-map", f"-0:{index}"]
+    args += ["-c", "copy"]
+    for number, output in enumerate(outputs, 1):
+        language, title = output_tags(video, output)
+        subtitle = kept + number - 1
+        args += ["-map", f"{number}:0", f"-c:s:{subtitle}", codec]
+        args += [f"-metadata:s:s:{subtitle}", f"language={language}"]
+        args += [f"-metadata:s:s:{subtitle}", f"title={title}"]
+    tmp = video.with_name(f".{video.stem}.{os.getpid()}.tmp{video.suffix}")
+    try:
+        result = subprocess.run(
+            [*args, os.fspath(tmp)], stdin=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        if result.returncode:
+            raise ffmpeg.Error("ffmpeg", None, result.stderr)
+        os.replace(tmp, video)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
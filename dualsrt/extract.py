@@ -1,7 +1,25 @@
-from tempfile import TemporaryDirectory
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from operator import methodcaller
 
 import ffmpeg
+import srt
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, TextIO, TypeVar
+
+from . import mkv
+from .cache import SubtitleCache
+from .mux import WINDOW_LOOKBACK
+
+T = TypeVar("T")
+Parser = Callable[[str], Iterable]
+Window = Optional[tuple[Optional[timedelta], Optional[timedelta]]]
+EMBEDDED_TITLE_PREFIX = "dual_"
+BLOCK_BOUNDARY = re.compile(r"\r?\n\r?\n(?=\d+\r?\n\d+:\d+:\d+[,.]\d+ *-->)")
 
 
 def find_subtitles(
@@ -10,17 +28,42 @@ def find_subtitles(
     skip_commentary=True,
     drop_redundant_forced=True,
     drop_redundant_sdh=True,
+    cache: Optional[SubtitleCache] = None,
+    native=False,
 ):
+    probe = load_probe(file, cache, native)
+    return select_subtitles(
+        probe, languages, skip_commentary, drop_redundant_forced, drop_redundant_sdh
+    )
+
+
+def load_probe(file: Path, cache: Optional[SubtitleCache] = None, native=False):
+    probe = cache.load_probe(file) if cache else None
+    if probe is None:
+        probe = probe_subtitles(file, native)
+        if cache:
+            cache.store_probe(file, probe)
+    return probe
+
+
+def select_subtitles(
+    probe: dict,
+    languages,
+    skip_commentary=True,
+    drop_redundant_forced=True,
+    drop_redundant_sdh=True,
+) -> dict[str, list[dict]]:
     subtitles = {language: [] for language in languages}
-    probe = ffmpeg.probe(file, select_streams="s")
     for stream in probe["streams"]:
         if stream["codec_name"] == "hdmv_pgs_subtitle":
             continue
-        stream_language = stream["tags"]["language"]
+        stream_language = stream["tags"].get("language")
         if stream_language in subtitles:
             title = stream["tags"].get("title", "").lower()
             if skip_commentary and "comm" in title:
                 continue
+            if title.startswith(EMBEDDED_TITLE_PREFIX):
+                continue  # embedded by a previous --embed run
             subtitles[stream_language].append(stream)
     for streams in subtitles.values():
         if drop_redundant_forced:
@@ -39,13 +82,152 @@ def find_subtitles(
     return subtitles
 
 
-def extract_subtitle_tracks(file: Path, *tracks: int) -> dict[int, str]:
-    with TemporaryDirectory() as tmp_dir:
-        tmp_dir = Path(tmp_dir)
-        subs = [(track, tmp_dir / f"{track}.srt") for track in tracks]
+def probe_subtitles(file: Path, native=False) -> dict:
+    if native and mkv.is_matroska(file):
+        try:
+            return mkv.probe(file)
+        except mkv.MatroskaError:
+            pass
+    return ffmpeg.probe(file, select_streams="s")
+
+
+def extract_subtitle_tracks(
+    file: Path,
+    *tracks: int,
+    cache: Optional[SubtitleCache] = None,
+    native=False,
+    window: Window = None,
+) -> dict[int, str]:
+    # cached tracks are always whole; tracks read for a window are not cached
+    if not cache:
+        return extract_text(file, native, *tracks, window=window)
+    extracted = {track: cache.load_track(file, track) for track in tracks}
+    missing = [track for track, text in extracted.items() if text is None]
+    if missing:
+        for track, text in extract_text(file, native, *missing, window=window).items():
+            if window is None:
+                cache.store_track(file, track, text)
+            extracted[track] = text
+    return extracted
+
+
+def parse_subtitle_tracks(
+    file: Path,
+    *tracks: int,
+    native=False,
+    parse: Parser = srt.parse,
+    window: Window = None,
+) -> dict[int, list]:
+    texts = extract_native(file, *tracks) if native else {}
+    parsed = {track: list(parse(text)) for track, text in texts.items()}
+    remaining = [track for track in tracks if track not in parsed]
+    if remaining:
+        consume = partial(read_cues, parse=parse)
+        parsed.update(run_extraction(file, consume, *remaining, window=window))
+    return {track: parsed[track] for track in tracks}
+
+
+def extract_text(
+    file: Path, native: bool, *tracks: int, window: Window = None
+) -> dict[int, str]:
+    extracted = extract_native(file, *tracks) if native else {}
+    remaining = [track for track in tracks if track not in extracted]
+    if remaining:
+        read = methodcaller("read")
+        extracted.update(run_extraction(file, read, *remaining, window=window))
+    return {track: extracted[track] for track in tracks}
+
+
+def extract_native(file: Path, *tracks: int) -> dict[int, str]:
+    # ffmpeg stays responsible for anything the Matroska reader can't handle
+    if not mkv.is_matroska(file):
+        return {}
+    try:
+        return mkv.extract_tracks(file, *tracks)
+    except mkv.MatroskaError:
+        return {}
+
+
+def run_extraction(
+    file: Path, consume: Callable[[TextIO], T], *tracks: int, window: Window = None
+) -> dict[int, T]:
+    pipes = {track: os.pipe() for track in tracks}
+    writes = {track: write for track, (_, write) in pipes.items()}
+    args = extraction_args(file, writes, window)
+    write_ends = [write for _, write in pipes.values()]
+    try:
+        process = subprocess.Popen(args, stdin=subprocess.DEVNULL, pass_fds=write_ends)
+    except BaseException:
+        for read, _ in pipes.values():
+            os.close(read)
+        raise
+    finally:
+        for write in write_ends:
+            os.close(write)
+    try:
+        # all pipes are drained concurrently so ffmpeg never blocks on a full one
+        with ThreadPoolExecutor(len(pipes)) as pool:
+            futures = {
+                track: pool.submit(drain, read, consume)
+                for track, (read, _) in pipes.items()
+            }
+        extracted = {track: future.result() for track, future in futures.items()}
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.wait()
+    if process.returncode:
+        raise ffmpeg.Error("ffmpeg", None, None)
+    return extracted
+
+
+def extraction_args(
+    file: Path, pipes: dict[int, int], window: Window = None
+) -> list[str]:
+    # one ffmpeg run writing each track as SRT to its pipe file descriptor
+    stream = ffmpeg.input(file, loglevel="error", **seek_options(window))
+    outputs = [
+        stream.output(f"pipe:{fd}", map=f"0:{track}", f="srt")
+        for track, fd in pipes.items()
+    ]
+    return ffmpeg.merge_outputs(*outputs).compile()
+
+
+def seek_options(window: Window) -> dict:
+    # input seeking reads only the window and the context window_cues keeps
+    # around it; -copyts keeps the original timestamps
+    if window is None:
+        return {}
+    start, end = window
+    seek = max((start or timedelta(0)) - WINDOW_LOOKBACK, timedelta(0))
+    options = {"copyts": None}
+    if seek:
+        options["ss"] = seek.total_seconds()
+    if end is not None:
+        options["t"] = (end + WINDOW_LOOKBACK - seek).total_seconds()
+    return options
+
+
+def drain(fd: int, consume: Callable[[TextIO], T]) -> T:
+    with open(fd, encoding="utf-8") as pipe:
+        return consume(pipe)
+
+
+def read_cues(stream: TextIO, parse: Parser = srt.parse) -> list:
+    return list(parse_stream(stream, parse=parse))
 
-        stream = ffmpeg.input(file, loglevel="error")
-        outputs = [stream.output(str(sub), map=f"0:{track}") for track, sub in subs]
-        ffmpeg.merge_outputs(*outputs).run()
 
-        return {track: sub.read_text() for track, sub in subs}
+def parse_stream(
+    stream: TextIO, chunk_size=64 * 1024, parse: Parser = srt.parse
+) -> Iterator:
+    pending = ""
+    while chunk := stream.read(chunk_size):
+        pending += chunk
+        boundary = None
+        for boundary in BLOCK_BOUNDARY.finditer(pending):
+            pass
+        if boundary:
+            yield from parse(pending[: boundary.end()])
+            pending = pending[boundary.end() :]
+    yield from parse(pending)
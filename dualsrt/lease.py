@@ -0,0 +1,119 @@
+import os
+import socket
+import time
+from contextlib import contextmanager
+from hashlib import sha256
+from pathlib import Path
+from threading import Event, Thread
+from typing import Iterator, Optional
+from uuid import uuid4
+
+DEFAULT_LEASE_TTL = 600.0
+CLAIMED_ELSEWHERE = "claimed by another node"
+
+
+def shard_of(video: Path, count: int) -> int:
+    # the same on every node that sees the library under the same path
+    digest = sha256(os.fsencode(video.resolve())).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def shard_order(videos: list[Path], index: int, count: int, rest=False) -> list[Path]:
+    # the videos of shard index (counting from 0), followed by the other
+    # shards' videos if rest, for idle nodes to claim
+    own = [video for video in videos if shard_of(video, count) == index]
+    if not rest:
+        return own
+    return own + [video for video in videos if shard_of(video, count) != index]
+
+
+def lease_path(video: Path) -> Path:
+    return video.parent / f".{video.name}.dualsrt.lease"
+
+
+class Lease:
+    # an exclusively created file next to the video, touched while the video
+    # is processed; a lease untouched for ttl seconds belonged to a node that
+    # died or lost the filesystem and is taken over
+    def __init__(self, video: Path, ttl: float = DEFAULT_LEASE_TTL):
+        if not 0 < ttl < float("inf"):
+            raise ValueError(f"invalid lease ttl {ttl}")
+        self.path = lease_path(video)
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()} {os.getpid()} {uuid4().hex}"
+        self.released = Event()
+        self.renewer: Optional[Thread] = None
+
+    def acquire(self) -> bool:
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                if not self.break_stale():
+                    return False
+                continue
+            with open(fd, "w") as lease:
+                lease.write(self.owner)
+            self.renewer = Thread(target=self.renew, daemon=True)
+            self.renewer.start()
+            return True
+        return False
+
+    def break_stale(self) -> bool:
+        try:
+            if time.time() - self.path.stat().st_mtime < self.ttl:
+                return False
+        except FileNotFoundError:
+            return True
+        # renaming is atomic, so only one node moves a stale lease aside
+        moved = self.path.with_name(f"{self.path.name}.{uuid4().hex}")
+        try:
+            os.rename(self.path, moved)
+        except FileNotFoundError:
+            return True
+        try:
+            if time.time() - moved.stat().st_mtime < self.ttl:
+                # another node broke it first and this was its new lease
+                try:
+                    os.link(moved, self.path)
+                except FileExistsError:
+                    pass
+                return False
+            return True
+        finally:
+            moved.unlink(missing_ok=True)
+
+    def owned(self) -> bool:
+        try:
+            return self.path.read_text() == self.owner
+        except FileNotFoundError:
+            return False
+
+    def renew(self):
+        while not self.released.wait(self.ttl / 3):
+            if not self.owned():
+                return  # taken over after this node stalled for too long
+            os.utime(self.path)
+
+    def release(self):
+        self.released.set()
+        if self.renewer:
+            self.renewer.join()
+        if self.owned():
+            self.path.unlink(missing_ok=True)
+
+
+@contextmanager
+def claim(video: Path, ttl: Optional[float]) -> Iterator[bool]:
+    # without a ttl every video counts as claimed
+    if ttl is None:
+        yield True
+        return
+    lease = Lease(video, ttl)
+    if not lease.acquire():
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        lease.release()
@@ -0,0 +1,54 @@
+import json
+import os
+from hashlib import sha256
+from pathlib import Path
+
+from .cache import fingerprint
+
+VERSION = 1
+
+
+def manifest_path(video: Path) -> Path:
+    return video.parent / f".{video.name}.dualsrt.json"
+
+
+def options_hash(*options) -> str:
+    # everything that changes the produced subtitles, json-encoded
+    key = json.dumps([VERSION, *options], sort_keys=True, default=str)
+    return sha256(key.encode()).hexdigest()
+
+
+def up_to_date(video: Path, options: str) -> bool:
+    try:
+        manifest = json.loads(manifest_path(video).read_text(encoding="utf-8"))
+        source = fingerprint(video)
+    except (OSError, ValueError):
+        return False
+    # anything but the shape written by write_manifest means a rebuild
+    if not isinstance(manifest, dict):
+        return False
+    outputs = manifest.get("outputs")
+    if not isinstance(outputs, list) or not all(isinstance(n, str) for n in outputs):
+        return False
+    return (
+        manifest.get("source") == source
+        and manifest.get("options") == options
+        and all((video.parent / name).is_file() for name in outputs)
+    )
+
+
+def write_manifest(video: Path, options: str, streams: list[int], outputs: list[Path]):
+    path = manifest_path(video)
+    manifest = {
+        "source": fingerprint(video),
+        "options": options,
+        "streams": streams,
+        "outputs": [output.name for output in outputs],
+    }
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,421 @@
+import mmap
+import re
+import zlib
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+import srt
+
+EBML = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+NAME = 0x536E
+LANGUAGE = 0x22B59C
+FLAG_DEFAULT = 0x88
+FLAG_FORCED = 0x55AA
+CONTENT_ENCODINGS = 0x6D80
+CONTENT_ENCODING = 0x6240
+CONTENT_COMPRESSION = 0x5034
+CONTENT_COMP_ALGO = 0x4254
+CONTENT_COMP_SETTINGS = 0x4255
+CUES = 0x1C53BB6B
+CUE_POINT = 0xBB
+CUE_TRACK_POSITIONS = 0xB7
+CUE_TRACK = 0xF7
+CUE_CLUSTER_POSITION = 0xF1
+CUE_RELATIVE_POSITION = 0xF0
+CLUSTER = 0x1F43B675
+TIMESTAMP = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+BLOCK_DURATION = 0x9B
+
+LEVEL1 = {SEEK_HEAD, INFO, TRACKS, CUES, CLUSTER, 0x1043A770, 0x1254C367, 0x1941A469}
+SUBTITLE_TRACK = 0x11
+CODEC_NAMES = {
+    "S_TEXT/UTF8": "subrip",
+    "S_TEXT/ASS": "ass",
+    "S_TEXT/SSA": "ssa",
+    "S_ASS": "ass",
+    "S_SSA": "ssa",
+    "S_TEXT/WEBVTT": "webvtt",
+    "S_HDMV/PGS": "hdmv_pgs_subtitle",
+    "S_VOBSUB": "dvd_subtitle",
+}
+TEXT_CODECS = {"S_TEXT/UTF8", "S_TEXT/ASS", "S_TEXT/SSA", "S_ASS", "S_SSA"}
+ASS_OVERRIDE = re.compile(r"\{([^}]*)\}")
+# whole tag names only, so \bord2, \blur3 or \shad1 aren't read as \b or \s
+ASS_TAG = re.compile(r"\\(an\d|[ibus][01]?)(?![a-z0-9])")
+
+
+class MatroskaError(Exception):
+    pass
+
+
+class Track:
+    def __init__(self, index: int):
+        self.index = index
+        self.number = None
+        self.type = None
+        self.codec = ""
+        self.name = None
+        self.language = "eng"
+        self.default = 1
+        self.forced = 0
+        self.compression = None
+        self.comp_settings = b""
+
+    def stream(self) -> dict:
+        tags = {} if self.language == "und" else {"language": self.language}
+        if self.name:
+            tags["title"] = self.name
+        return {
+            "index": self.index,
+            "codec_name": CODEC_NAMES.get(self.codec, self.codec.lower()),
+            "codec_type": "subtitle",
+            "disposition": {"default": self.default, "forced": self.forced},
+            "tags": tags,
+        }
+
+    def decode(self, payload: bytes) -> str:
+        if self.compression == 0:
+            payload = zlib.decompress(payload)
+        elif self.compression == 3:
+            payload = self.comp_settings + payload
+        elif self.compression is not None:
+            raise MatroskaError(f"unsupported compression {self.compression}")
+        text = payload.decode("utf-8", errors="replace")
+        if self.codec != "S_TEXT/UTF8":
+            text = ass_to_srt(text.split(",", 8)[-1])
+        return text
+
+
+def is_matroska(file: Path) -> bool:
+    with open(file, "rb") as f:
+        return f.read(4) == EBML.to_bytes(4, "big")
+
+
+def probe(file: Path) -> dict:
+    with open_segment(file) as segment:
+        streams = [t.stream() for t in segment.tracks if t.type == SUBTITLE_TRACK]
+        return {"streams": streams}
+
+
+def extract_tracks(file: Path, *tracks: int) -> dict[int, str]:
+    # streams that are not text subtitles are left out of the result
+    with open_segment(file) as segment:
+        wanted = {
+            t.number: t
+            for t in segment.tracks
+            if t.index in tracks and t.type == SUBTITLE_TRACK and t.codec in TEXT_CODECS
+        }
+        cues = {number: [] for number in wanted}
+        for number, start, end, payload in segment.blocks(wanted):
+            content = wanted[number].decode(payload)
+            cues[number].append(srt.Subtitle(None, start, end, content))
+        return {t.index: srt.compose(cues[n]) for n, t in wanted.items()}
+
+
+def ass_to_srt(text: str) -> str:
+    def override(match):
+        tags = ASS_TAG.findall(match.group(1))
+        converted = []
+        for tag in tags:
+            if tag.startswith("an"):
+                converted.append(f"{{\\{tag}}}")
+            else:
+                # a bare tag goes back to the style, which is mostly plain text
+                closing = tag[1:] in ("0", "")
+                converted.append(f"</{tag[0]}>" if closing else f"<{tag[0]}>")
+        return "".join(converted)
+
+    text = ASS_OVERRIDE.sub(override, text)
+    return text.replace("\\N", "\n").replace("\\n", "\n").replace("\\h", " ")
+
+
+class open_segment:
+    def __init__(self, file: Path):
+        self.file = open(file, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self.file.close()
+            raise MatroskaError(f"{file} is empty")
+
+    def __enter__(self) -> "Segment":
+        try:
+            return Segment(self.data)
+        except BaseException as error:
+            self.__exit__(type(error), error, None)
+            raise
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.data.close()
+        self.file.close()
+        if isinstance(exc, (IndexError, ValueError, zlib.error)):
+            raise MatroskaError(f"malformed Matroska file: {exc}") from exc
+
+
+class Segment:
+    def __init__(self, data):
+        self.data = data
+        header_id, pos, size = read_header(data, 0)
+        if header_id != EBML:
+            raise MatroskaError("not an EBML file")
+        segment_id, self.start, size = read_header(data, pos + size)
+        if segment_id != SEGMENT:
+            raise MatroskaError("no Segment element")
+        self.end = len(data) if size is None else min(self.start + size, len(data))
+        self.level1 = self.find_level1()
+        if TRACKS not in self.level1:
+            raise MatroskaError("no Tracks element")
+        self.scale = 1_000_000
+        if INFO in self.level1:
+            info = self.level1[INFO]
+            for child, child_pos, child_size in children(data, *info):
+                if child == TIMESTAMP_SCALE:
+                    self.scale = read_uint(data, child_pos, child_size)
+        self.tracks = self.read_tracks(*self.level1[TRACKS])
+        self.cluster_timestamps = {}
+
+    def find_level1(self) -> dict[int, tuple[int, int]]:
+        found = {}
+        pos = self.start
+        seek_positions = []
+        while pos < self.end:
+            element, data_pos, size = read_header(self.data, pos)
+            if element == CLUSTER:
+                break  # everything after the first cluster is reached via SeekHead
+            if size is None:
+                raise MatroskaError("unknown-size element before clusters")
+            found.setdefault(element, (data_pos, data_pos + size))
+            if element == SEEK_HEAD:
+                seek_positions.extend(self.read_seek_head(data_pos, data_pos + size))
+            pos = data_pos + size
+        for element, position in seek_positions:
+            if element not in found and self.start + position < self.end:
+                found_id, data_pos, size = read_header(self.data, self.start + position)
+                if found_id == element and size is not None:
+                    found[element] = (data_pos, data_pos + size)
+        return found
+
+    def read_seek_head(self, start: int, end: int) -> Iterator[tuple[int, int]]:
+        for seek, seek_pos, seek_size in children(self.data, start, end):
+            if seek != SEEK:
+                continue
+            element = position = None
+            for child, child_pos, child_size in children(
+                self.data, seek_pos, seek_pos + seek_size
+            ):
+                if child == SEEK_ID:
+                    element = read_uint(self.data, child_pos, child_size)
+                elif child == SEEK_POSITION:
+                    position = read_uint(self.data, child_pos, child_size)
+            if element is not None and position is not None:
+                yield element, position
+
+    def read_tracks(self, start: int, end: int) -> list[Track]:
+        tracks = []
+        for entry, entry_pos, entry_size in children(self.data, start, end):
+            if entry != TRACK_ENTRY:
+                continue
+            track = Track(len(tracks))
+            for child, pos, size in walk(self.data, entry_pos, entry_pos + entry_size):
+                if child == TRACK_NUMBER:
+                    track.number = read_uint(self.data, pos, size)
+                elif child == TRACK_TYPE:
+                    track.type = read_uint(self.data, pos, size)
+                elif child == CODEC_ID:
+                    track.codec = read_string(self.data, pos, size)
+                elif child == NAME:
+                    track.name = read_string(self.data, pos, size)
+                elif child == LANGUAGE:
+                    track.language = read_string(self.data, pos, size)
+                elif child == FLAG_DEFAULT:
+                    track.default = read_uint(self.data, pos, size)
+                elif child == FLAG_FORCED:
+                    track.forced = read_uint(self.data, pos, size)
+                elif child == CONTENT_COMP_ALGO:
+                    track.compression = read_uint(self.data, pos, size)
+                elif child == CONTENT_COMP_SETTINGS:
+                    track.comp_settings = bytes(self.data[pos : pos + size])
+                elif child == CONTENT_COMPRESSION and track.compression is None:
+                    track.compression = 0  # zlib is the default algorithm
+            tracks.append(track)
+        return tracks
+
+    def blocks(
+        self, tracks: dict[int, Track]
+    ) -> Iterator[tuple[int, timedelta, timedelta, bytes]]:
+        # when Cues give block positions for every track, only those blocks
+        # are read, so the cost follows the subtitles instead of the whole
+        # container; otherwise every cluster is walked, reading the header of
+        # each block. mkvmerge indexes every subtitle block and ffmpeg none,
+        # but blocks that a muxer leaves out of Cues it does write are missed
+        indexed = self.cue_positions(tracks) if CUES in self.level1 else {}
+        found = []
+        if indexed.keys() == tracks.keys():
+            positions = {pos for entries in indexed.values() for pos in entries}
+            for cluster, block in sorted(positions):
+                found.extend(self.read_cue_block(cluster, block, tracks))
+        else:
+            for cluster_start, cluster_end in self.clusters():
+                found.extend(self.read_cluster(cluster_start, cluster_end, tracks))
+        found.sort(key=lambda block: (block[1], block[2]))
+        for number, start, duration, payload in found:
+            yield number, self.time(start), self.time(start + duration), payload
+
+    def cue_positions(self, tracks) -> dict[int, list[tuple[int, int]]]:
+        positions = {}
+        for point, point_pos, point_size in children(self.data, *self.level1[CUES]):
+            if point != CUE_POINT:
+                continue
+            for entry, pos, size in children(
+                self.data, point_pos, point_pos + point_size
+            ):
+                if entry != CUE_TRACK_POSITIONS:
+                    continue
+                values = {
+                    child: read_uint(self.data, child_pos, child_size)
+                    for child, child_pos, child_size in children(
+                        self.data, pos, pos + size
+                    )
+                }
+                track = values.get(CUE_TRACK)
+                if track in tracks and CUE_RELATIVE_POSITION in values:
+                    cluster = values[CUE_CLUSTER_POSITION]
+                    relative = values[CUE_RELATIVE_POSITION]
+                    positions.setdefault(track, []).append((cluster, relative))
+        return positions
+
+    def read_cue_block(self, cluster: int, relative: int, tracks):
+        cluster_id, data_pos, size = read_header(self.data, self.start + cluster)
+        if cluster_id != CLUSTER:
+            raise MatroskaError("cue does not point at a cluster")
+        if data_pos not in self.cluster_timestamps:
+            end = self.end if size is None else data_pos + size
+            self.cluster_timestamps[data_pos] = self.cluster_timestamp(data_pos, end)
+        timestamp = self.cluster_timestamps[data_pos]
+        element, pos, size = read_header(self.data, data_pos + relative)
+        return read_block(self.data, element, pos, size, timestamp, tracks)
+
+    def cluster_timestamp(self, start: int, end: int) -> int:
+        for element, pos, size in children(self.data, start, end):
+            if element == TIMESTAMP:
+                return read_uint(self.data, pos, size)
+            if element in (SIMPLE_BLOCK, BLOCK_GROUP):
+                break
+        raise MatroskaError("cluster has no timestamp before its blocks")
+
+    def clusters(self) -> Iterator[tuple[int, int]]:
+        pos = self.start
+        while pos < self.end:
+            element, data_pos, size = read_header(self.data, pos)
+            if size is None:
+                size = unknown_size_end(self.data, data_pos, self.end) - data_pos
+            if element == CLUSTER:
+                yield data_pos, data_pos + size
+            pos = data_pos + size
+
+    def read_cluster(self, start: int, end: int, tracks):
+        timestamp = 0
+        for element, pos, size in children(self.data, start, end):
+            if element == TIMESTAMP:
+                timestamp = read_uint(self.data, pos, size)
+            else:
+                yield from read_block(self.data, element, pos, size, timestamp, tracks)
+
+    def time(self, ticks: int) -> timedelta:
+        return timedelta(microseconds=ticks * self.scale // 1000)
+
+
+def read_block(data, element: int, pos: int, size: int, cluster_time: int, tracks):
+    duration = 0
+    if element == BLOCK_GROUP:
+        block = None
+        for child, child_pos, child_size in children(data, pos, pos + size):
+            if child == BLOCK:
+                block = child_pos, child_size
+            elif child == BLOCK_DURATION:
+                duration = read_uint(data, child_pos, child_size)
+        if block is None:
+            return
+        pos, size = block
+    elif element != SIMPLE_BLOCK:
+        return
+    track, header_end = read_vint(data, pos)
+    if track not in tracks:
+        return
+    relative = int.from_bytes(data[header_end : header_end + 2], "big", signed=True)
+    if data[header_end + 2] & 0x06:
+        raise MatroskaError("laced subtitle blocks are not supported")
+    payload = bytes(data[header_end + 3 : pos + size])
+    yield track, cluster_time + relative, duration, payload
+
+
+def read_vint(data, pos: int, marker=False) -> tuple[int, int]:
+    first = data[pos]
+    if not first:
+        raise MatroskaError(f"invalid variable-size integer at {pos}")
+    length = 9 - first.bit_length()
+    value = first if marker else first & (0xFF >> length)
+    for byte in data[pos + 1 : pos + length]:
+        value = value << 8 | byte
+    return value, pos + length
+
+
+def read_header(data, pos: int) -> tuple[int, int, Optional[int]]:
+    element, size_pos = read_vint(data, pos, marker=True)
+    size, data_pos = read_vint(data, size_pos)
+    if size == (1 << 7 * (data_pos - size_pos)) - 1:
+        size = None
+    return element, data_pos, size
+
+
+def children(data, start: int, end: int) -> Iterator[tuple[int, int, int]]:
+    pos = start
+    while pos < end:
+        element, data_pos, size = read_header(data, pos)
+        if size is None:
+            size = unknown_size_end(data, data_pos, end) - data_pos
+        yield element, data_pos, size
+        pos = data_pos + size
+
+
+def walk(data, start: int, end: int) -> Iterator[tuple[int, int, int]]:
+    for element, pos, size in children(data, start, end):
+        if element in (CONTENT_ENCODINGS, CONTENT_ENCODING, CONTENT_COMPRESSION):
+            yield element, pos, size
+            yield from walk(data, pos, pos + size)
+        else:
+            yield element, pos, size
+
+
+def unknown_size_end(data, start: int, end: int) -> int:
+    pos = start
+    while pos < end:
+        element, data_pos, size = read_header(data, pos)
+        if element in LEVEL1 or size is None:
+            return pos
+        pos = data_pos + size
+    return end
+
+
+def read_uint(data, pos: int, size: int) -> int:
+    return int.from_bytes(data[pos : pos + size], "big")
+
+
+def read_string(data, pos: int, size: int) -> str:
+    return bytes(data[pos : pos + size]).rstrip(b"\0").decode("utf-8", "replace")
@@ -1,18 +1,26 @@
 import re
+from bisect import bisect_left, bisect_right
 from datetime import timedelta
-from heapq import merge
-from itertools import chain
-from typing import Iterable, Optional
+from heapq import heappop, heappush, merge
+from itertools import chain, count, tee
+from sys import intern
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Union
 
 from srt import Subtitle
 
 FONT_TAG = re.compile(r"<font\s+[^>]+>|</font>")
 POSITION = re.compile(r"\{\\an\d}")
+MICROSECOND = timedelta(microseconds=1)
+DEFAULT_MIN_LEN = timedelta(milliseconds=900)
+# enough context on both sides of a time window to mux it like the whole
+# track
+WINDOW_LOOKBACK = timedelta(seconds=30)
 
 
-def pairwise(iter):
-    cached = list(iter)
-    return zip(cached, cached[1:])
+def pairwise(iterable):
+    first, second = tee(iterable)
+    next(second, None)
+    return zip(first, second)
 
 
 def patched_eq(self, other):
@@ -22,38 +30,375 @@ def patched_eq(self, other):
 Subtitle.__eq__ = patched_eq
 
 
+class Cue:
+    # compact mux engine representation: timedelta times become integer
+    # microseconds (exact, unlike milliseconds once align_subtitles halves a
+    # cue) and the source subtitle is kept for its index; normalized holds the
+    # content without font tags and its position tag once prepare_cues ran
+    __slots__ = ("start", "end", "content", "source", "normalized")
+
+    def __init__(
+        self,
+        start,
+        end,
+        content: str,
+        source: Subtitle,
+        normalized: Optional[tuple[str, str]] = None,
+    ):
+        self.start = start
+        self.end = end
+        self.content = content
+        self.source = source
+        self.normalized = normalized
+
+    @classmethod
+    def from_subtitle(cls, sub: Subtitle) -> "Cue":
+        return cls(to_us(sub.start), to_us(sub.end), intern(sub.content), sub)
+
+    def slice(self, start, end) -> "Cue":
+        return Cue(start, end, self.content, self.source, self.normalized)
+
+    def subtitle(self, index=None, content=None) -> Subtitle:
+        # cues without a source come from dualsrt.srtio and always use timedelta
+        source = self.source
+        start, end = self.start, self.end
+        if source is None or isinstance(source.start, timedelta):
+            start, end = timedelta(microseconds=start), timedelta(microseconds=end)
+        if content is not None:
+            return Subtitle(index, start, end, content)
+        if source is None:
+            return Subtitle(None, start, end, self.content)
+        return Subtitle(source.index, start, end, self.content, source.proprietary)
+
+
+def to_us(value):
+    return value // MICROSECOND if isinstance(value, timedelta) else value
+
+
+def cues(subs: Iterable[Union[Subtitle, Cue]]) -> Iterator[Cue]:
+    # parsed cues are copied since align_cues retimes them in place
+    for sub in subs:
+        if isinstance(sub, Cue):
+            yield sub.slice(sub.start, sub.end)
+        else:
+            yield Cue.from_subtitle(sub)
+
+
+def prepare_cues(subs: Iterable[Union[Subtitle, Cue]]) -> list[Cue]:
+    # normalizes each distinct content once for every combo the track is in
+    normalized = {}
+    prepared = list(cues(subs))
+    for cue in prepared:
+        if cue.content not in normalized:
+            normalized[cue.content] = normalize(cue.content)
+        cue.normalized = normalized[cue.content]
+    return prepared
+
+
+class StartTimes:
+    # start times of a track sorted by start, read lazily by bisect
+    __slots__ = ("subs",)
+
+    def __init__(self, subs: Sequence[Union[Subtitle, Cue]]):
+        self.subs = subs
+
+    def __len__(self):
+        return len(self.subs)
+
+    def __getitem__(self, index):
+        return to_us(self.subs[index].start)
+
+
+class EndTimes(StartTimes):
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        return to_us(self.subs[index].end)
+
+
+def window_cues(
+    subs: Sequence[Union[Subtitle, Cue]],
+    start: Optional[timedelta] = None,
+    end: Optional[timedelta] = None,
+) -> Sequence[Union[Subtitle, Cue]]:
+    # the cues of a window with enough context on both sides to mux it just
+    # like the whole track would be; clip_window then cuts the dual subtitles
+    lookback = to_us(WINDOW_LOOKBACK)
+    last = len(subs)
+    if end is not None:
+        last = bisect_left(StartTimes(subs), to_us(end) + lookback)
+    if start is None:
+        return subs[:last]
+    # cues before the window are picked by their end, so a long one started
+    # well before it is kept too
+    index = IntervalIndex(subs[:last])
+    return index.overlapping(to_us(start) - lookback, float("inf"))
+
+
+def clip_window(
+    subs: Iterable[Subtitle],
+    start: Optional[timedelta] = None,
+    end: Optional[timedelta] = None,
+    keep_times=False,
+) -> Iterator[Subtitle]:
+    # subtitles are cut to the window and shifted to begin at zero unless
+    # keep_times; cutting keeps them sorted by start, but the ones then
+    # starting together are sorted again by end like srt.compose would
+    start = start or timedelta(0)
+    shift = timedelta(0) if keep_times else start
+    tied = []
+    for sub in subs:
+        if sub.end > start and (end is None or sub.start < end):
+            sub.start = max(sub.start, start) - shift
+            sub.end = (sub.end if end is None else min(sub.end, end)) - shift
+            if tied and sub.start != tied[0].start:
+                yield from sorted(tied)
+                tied = []
+            tied.append(sub)
+    yield from sorted(tied)
+
+
+def subtitle_pairs(
+    segments: Iterable[list[Optional[Cue]]],
+) -> Iterator[list[Optional[Subtitle]]]:
+    for segment in segments:
+        yield [cue and cue.subtitle() for cue in segment]
+
+
 def dual_subtitles(
-    primary: Iterable[Subtitle],
-    secondary: Iterable[Subtitle],
+    primary: Iterable[Union[Subtitle, Cue]],
+    secondary: Iterable[Union[Subtitle, Cue]],
     primary_font: dict,
     secondary_font: dict,
-    min_len=timedelta(milliseconds=900),
-) -> Iterable[Subtitle]:
-    combined = []
-    aligned = align_subtitles(combine_subtitles(primary, secondary), min_len)
-    primary_font_attrs = font_attrs(primary_font)
-    secondary_font_attrs = font_attrs(secondary_font)
-    for idx, (prim, sec) in enumerate(aligned, 1):
+    min_len=DEFAULT_MIN_LEN,
+    engine="python",
+) -> Iterator[Subtitle]:
+    return stacked_subtitles(
+        [primary, secondary], [primary_font, secondary_font], min_len, engine
+    )
+
+
+def stacked_subtitles(
+    tracks: Sequence[Iterable[Union[Subtitle, Cue]]],
+    fonts: Sequence[dict],
+    min_len=DEFAULT_MIN_LEN,
+    engine="python",
+) -> Iterator[Subtitle]:
+    # the first track's cue above two lines of every other track's, dots
+    # standing in for the ones not shown
+    longest = 0
+
+    def measured(track):
+        nonlocal longest
+        for cue in cues(track):
+            longest = max(longest, cue.end - cue.start)
+            yield cue
+
+    # a segment comes from a cue read so far or starts after them, so it
+    # can't start before an earlier one by more than twice the longest of
+    # those cues and align_cues' min_len
+    combined = COMBINE_ENGINES[engine](*map(measured, tracks))
+    aligned = chronological(
+        align_cues(combined, to_us(min_len)), lambda: 2 * longest + to_us(min_len)
+    )
+    primary_font_attrs, *other_font_attrs = map(font_attrs, fonts)
+    for idx, (prim, *others) in enumerate(aligned, 1):
         content = []
         if prim:
-            prim_content = strip_font(prim.content.strip())
-            prim_content, position = extract_position(prim_content)
+            prim_content, position = prim.normalized or normalize(prim.content)
             if primary_font_attrs:
                 prim_content = f"<font {primary_font_attrs}>{prim_content}</font>"
             content.extend((position, prim_content, "\n"))
-        sec_content = ".\n."
-        if sec:
-            sec_content = strip_font(sec.content.strip())
-            sec_content, _ = extract_position(sec_content)
-            if "\n" not in sec_content:
-                sec_content += "\n."
-        if secondary_font_attrs:
-            sec_content = f"<font {secondary_font_attrs}>{sec_content}</font>"
-        content.append(sec_content)
-        start = (prim or sec).start
-        end = (prim or sec).end
-        combined.append(Subtitle(idx, start, end, "".join(content)))
-    return combined
+        lines = []
+        for sec, secondary_font_attrs in zip(others, other_font_attrs):
+            sec_content = ".\n."
+            if sec:
+                sec_content, _ = sec.normalized or normalize(sec.content)
+                if "\n" not in sec_content:
+                    sec_content += "\n."
+            if secondary_font_attrs:
+                sec_content = f"<font {secondary_font_attrs}>{sec_content}</font>"
+            lines.append(sec_content)
+        content.append("\n".join(lines))
+        shown = prim
+        if not shown:
+            for shown in others:
+                if shown:
+                    break
+        yield shown.subtitle(idx, "".join(content))
+
+
+def chronological(
+    segments: Iterable[list[Optional[Cue]]], slack: Callable[[], int]
+) -> Iterator[list]:
+    # segments sorted by start and end, in srt.compose order, as long as none
+    # starts more than slack() before one that came earlier; align_cues
+    # decides on the order the combine engines give, so only its output is
+    # sorted
+    pending = []
+    for n, segment in enumerate(segments):
+        for shown in segment:
+            if shown:
+                break
+        low = shown.start - slack()
+        while pending and pending[0][0] < low:
+            yield heappop(pending)[-1]
+        heappush(pending, (shown.start, shown.end, n, segment))
+    while pending:
+        yield heappop(pending)[-1]
+
+
+def chunked_subtitles(
+    tracks: Sequence[Iterable[Union[Subtitle, Cue]]],
+    fonts: Sequence[dict],
+    executor,
+    chunks: int,
+    min_len=DEFAULT_MIN_LEN,
+    engine="python",
+) -> Iterator[Subtitle]:
+    # the same subtitles as stacked_subtitles, muxed in up to chunks parts
+    # by the executor's processes; tracks must be sorted by start
+    tracks = [list(track) for track in tracks]
+    splits = quiet_splits(tracks, chunks, to_us(min_len))
+    if not splits:
+        yield from stacked_subtitles(tracks, fonts, min_len, engine)
+        return
+    parts = []
+    for track in tracks:
+        bounds = [bisect_left(StartTimes(track), split) for split in splits]
+        parts.append(
+            [
+                packed_cues(track[first:last])
+                for first, last in zip([0, *bounds], [*bounds, len(track)])
+            ]
+        )
+    count = len(splits) + 1
+    muxed = executor.map(
+        mux_chunk,
+        zip(*parts),
+        [fonts] * count,
+        [min_len] * count,
+        [engine] * count,
+    )
+    index = 0
+    for subtitles in muxed:
+        for start, end, content, timed in subtitles:
+            index += 1
+            if timed:
+                start, end = timedelta(microseconds=start), timedelta(microseconds=end)
+            yield Subtitle(index, start, end, content)
+
+
+# stands in for the source of cues with integer times in other processes
+INTEGER_TIMES = Subtitle(None, 0, 0, "")
+
+
+def packed_cues(subs: Iterable[Union[Subtitle, Cue]]) -> list[tuple]:
+    # plain tuples of integers and strings pickle many times faster than
+    # cues, their sources or timedelta
+    packed = []
+    for sub in subs:
+        if isinstance(sub, Cue):
+            source = sub.source
+            timed = source is None or isinstance(source.start, timedelta)
+            packed.append((sub.start, sub.end, sub.content, sub.normalized, timed))
+        else:
+            timed = isinstance(sub.start, timedelta)
+            packed.append((to_us(sub.start), to_us(sub.end), sub.content, None, timed))
+    return packed
+
+
+def mux_chunk(
+    tracks: Sequence[list[tuple]],
+    fonts: Sequence[dict],
+    min_len,
+    engine: str,
+) -> list[tuple]:
+    tracks = [
+        [
+            Cue(start, end, content, None if timed else INTEGER_TIMES, normalized)
+            for start, end, content, normalized, timed in track
+        ]
+        for track in tracks
+    ]
+    return [
+        (
+            to_us(sub.start),
+            to_us(sub.end),
+            sub.content,
+            isinstance(sub.start, timedelta),
+        )
+        for sub in stacked_subtitles(tracks, fonts, min_len, engine)
+    ]
+
+
+def quiet_splits(
+    tracks: Sequence[list[Union[Subtitle, Cue]]], chunks: int, min_len: int
+) -> list[int]:
+    # start times of cues that follow a gap where no track shows a cue,
+    # about evenly spread over the timeline; the combined segments on both
+    # sides of the gap must be longer than min_len, so align_cues keeps them
+    # whatever is on the other side and every chunk is muxed as in the whole
+    # timeline; overlapping cues within a track make combine_cues step back
+    # in time, such tracks aren't split
+    if chunks < 2 or not all(tracks) or not all(map(disjoint, tracks)):
+        return []
+    first = min(to_us(track[0].start) for track in tracks)
+    last = max(to_us(track[-1].start) for track in tracks)
+    tracks = [(StartTimes(track), EndTimes(track)) for track in tracks]
+    step = (last - first) // chunks
+    splits, time = [], first + step
+    while len(splits) < chunks - 1:
+        shown = [cue_at(starts, ends, time) for starts, ends in tracks]
+        if any(end is not None for end in shown):
+            time = max(end for end in shown if end is not None)
+            continue
+        # a gap, from the last cue ending before time to the next one starting
+        following = [
+            starts[bisect_left(starts, time)]
+            for starts, _ in tracks
+            if starts[-1] >= time
+        ]
+        if not following:
+            break
+        gap_end = min(following)
+        gap_start = max(
+            ends[bisect_left(starts, time) - 1]
+            for starts, ends in tracks
+            if starts[0] < time
+        )
+        if long_edges(tracks, gap_start, gap_end, min_len):
+            splits.append(gap_end)
+            time = gap_end + step
+        else:
+            time = gap_end
+    return splits
+
+
+def cue_at(starts: StartTimes, ends: EndTimes, time: int) -> Optional[int]:
+    # the end of a disjoint track's cue shown at time, if any
+    index = bisect_right(starts, time) - 1
+    if index >= 0 and ends[index] > time:
+        return ends[index]
+    return None
+
+
+def long_edges(tracks: list[tuple], gap_start: int, gap_end: int, min_len: int) -> bool:
+    # no cue of either track starts or ends within min_len of the gap
+    for starts, ends in tracks:
+        if (
+            within(starts, gap_start - min_len, gap_start)
+            or within(ends, gap_start - min_len, gap_start - 1)
+            or within(starts, gap_end + 1, gap_end + min_len)
+            or within(ends, gap_end, gap_end + min_len)
+        ):
+            return False
+    return True
+
+
+def within(times, low: int, high: int) -> bool:
+    index = bisect_left(times, low)
+    return index < len(times) and times[index] <= high
 
 
 def font_attrs(font: dict):
@@ -61,60 +406,248 @@ def font_attrs(font: dict):
 
 
 def combine_subtitles(
-    primary: Iterable[Subtitle], secondary: Iterable[Subtitle]
-) -> Iterable[tuple[Subtitle, Subtitle]]:
+    *tracks: Iterable[Subtitle], engine="python"
+) -> Iterator[list[Optional[Subtitle]]]:
+    combine = COMBINE_ENGINES[engine]
+    return subtitle_pairs(combine(*(cues(track) for track in tracks)))
+
+
+def combine_cues(*tracks: Iterable[Cue]) -> Iterator[list[Optional[Cue]]]:
+    if len(tracks) != 2:
+        yield from sweep_cues(tracks)
+        return
     current = [None, None]
-    combined = []
-    for sub, position in merge(((p, 0) for p in primary), ((s, 1) for s in secondary)):
+    for *_, position, _, cue in merge(*map(tagged_cues, tracks, (0, 1))):
         if current[position]:
-            combined.append(current)
+            yield current
             current = [None, None]
-        current[position] = sub
-        *overlapped, current = overlaps(*current)
-        combined.extend(overlapped)
+        current[position] = cue
+        overlapped = overlap_cues(*current)
+        current = overlapped.pop()
+        yield from overlapped
     if any(current):
-        combined.append(current)
-    return combined
+        yield current
+
+
+def sweep_cues(tracks: Sequence[Iterable[Cue]]) -> Iterator[list[Optional[Cue]]]:
+    # the tracks merged by a heap, O(n log k) for k tracks: the segments
+    # before a cue's start are final once it's reached, as every later cue
+    # starts after it; a track's next cue cuts the one it shows short
+    shown = [None] * len(tracks)
+    time = None
+    for start, _, position, _, cue in merge(*map(tagged_cues, tracks, count())):
+        if time is not None and start > time:
+            yield from shown_segments(shown, time, start)
+            shown = [cue if cue and cue.end > start else None for cue in shown]
+        time = start
+        shown[position] = cue
+    if time is not None:
+        end = max(cue.end for cue in shown if cue)
+        yield from shown_segments(shown, time, end)
+
+
+def shown_segments(shown: list[Optional[Cue]], start, end) -> Iterator[list]:
+    # the shown cues sliced between their ends within start to end
+    ends = {cue.end for cue in shown if cue and start < cue.end < end}
+    points = sorted({start, end, *ends})
+    for t1, t2 in zip(points, points[1:]):
+        segment = [
+            cue.slice(t1, t2) if cue and t2 <= cue.end else None for cue in shown
+        ]
+        if any(segment):
+            yield segment
+
+
+def tagged_cues(track: Iterable[Cue], position: int) -> Iterator[tuple]:
+    # (start, end, track, sequence) keys compare without touching the cues
+    for n, cue in enumerate(track):
+        yield cue.start, cue.end, position, n, cue
+
+
+def combine_cues_numpy(*tracks: Iterable[Cue]) -> Iterator[list[Optional[Cue]]]:
+    import numpy as np
+
+    tracks = [list(track) for track in tracks]
+    starts, ends = [], []
+    for track in tracks:
+        starts.append(np.fromiter((c.start for c in track), np.int64, len(track)))
+        ends.append(np.fromiter((c.end for c in track), np.int64, len(track)))
+    for track_starts, track_ends in zip(starts, ends):
+        # sweep semantics match combine_cues only for sorted, positive-length
+        # cues that don't overlap within a track
+        if np.any(track_starts >= track_ends) or np.any(
+            track_starts[1:] < track_ends[:-1]
+        ):
+            yield from combine_cues(*tracks)
+            return
+    points = np.unique(np.concatenate(starts + ends))
+    seg_starts, seg_ends = points[:-1], points[1:]
+    visible = []
+    for track_starts, track_ends in zip(starts, ends):
+        if not len(track_starts):
+            visible.append(np.full(len(seg_starts), -1))
+            continue
+        idx = np.searchsorted(track_starts, seg_starts, side="right") - 1
+        shown = (idx >= 0) & (track_ends[np.maximum(idx, 0)] >= seg_ends)
+        visible.append(np.where(shown, idx, -1))
+    keep = np.any([track_visible >= 0 for track_visible in visible], axis=0)
+    segments = zip(
+        seg_starts[keep].tolist(),
+        seg_ends[keep].tolist(),
+        *(track_visible[keep].tolist() for track_visible in visible),
+    )
+    for start, end, *shown in segments:
+        yield [
+            track[idx].slice(start, end) if idx >= 0 else None
+            for track, idx in zip(tracks, shown)
+        ]
+
+
+def combine_cues_indexed(*tracks: Iterable[Cue]) -> Iterator[list[Optional[Cue]]]:
+    # every segment between change points looks up the cue each track shows
+    # at its start; the same preconditions as combine_cues_numpy
+    tracks = [list(track) for track in tracks]
+    if not all(map(disjoint, tracks)):
+        yield from combine_cues(*tracks)
+        return
+    indexes = [IntervalIndex(track) for track in tracks]
+    points = sorted({t for c in chain(*tracks) for t in (c.start, c.end)})
+    for start, end in pairwise(points):
+        shown = [index.at(start) for index in indexes]
+        if any(shown):
+            yield [hits and hits[0].slice(start, end) or None for hits in shown]
+
+
+def disjoint(track: list[Cue]) -> bool:
+    # sorted, positive length cues that don't overlap within the track
+    return all(c.start < c.end for c in track) and all(
+        a.end <= b.start for a, b in pairwise(track)
+    )
+
+
+COMBINE_ENGINES = {
+    "python": combine_cues,
+    "numpy": combine_cues_numpy,
+    "index": combine_cues_indexed,
+}
+
+
+class IntervalIndex:
+    # cues sorted by start laid out as an implicit binary tree (the cgranges
+    # layout): leaves sit at even positions, the node at position i of level
+    # k has its children at i -/+ 2**(k-1), and max_ends[i] is the largest
+    # end in its subtree so queries skip subtrees ending too early, taking
+    # O(log n + k) for k results; times are microseconds or timedelta
+    def __init__(self, subs: Iterable[Union[Subtitle, Cue]]):
+        self.cues = sorted(subs, key=lambda sub: (to_us(sub.start), to_us(sub.end)))
+        self.starts = [to_us(sub.start) for sub in self.cues]
+        self.ends = [to_us(sub.end) for sub in self.cues]
+        self.max_ends = list(self.ends)
+        self.root_level = self.build()
+
+    def build(self) -> int:
+        ends, max_ends, count = self.ends, self.max_ends, len(self.cues)
+        if not count:
+            return -1
+        last_index = (count - 1) & ~1
+        last = ends[last_index]
+        level = 1
+        while 1 << level <= count:
+            half = 1 << (level - 1)
+            for i in range((half << 1) - 1, count, half << 2):
+                right = max_ends[i + half] if i + half < count else last
+                max_ends[i] = max(ends[i], max_ends[i - half], right)
+            # last_index climbs to its parent, which may lie past the end
+            last_index += -half if last_index >> level & 1 else half
+            if last_index < count and max_ends[last_index] > last:
+                last = max_ends[last_index]
+            level += 1
+        return level - 1
+
+    def __len__(self):
+        return len(self.cues)
+
+    def overlapping(self, start, end) -> list:
+        # cues shown at any time in [start, end), in start order
+        start, end = to_us(start), to_us(end)
+        starts, ends, max_ends = self.starts, self.ends, self.max_ends
+        count, found = len(self.cues), []
+        if not count:
+            return found
+        stack = [(self.root_level, (1 << self.root_level) - 1, False)]
+        while stack:
+            level, node, left_done = stack.pop()
+            if level <= 3:
+                # small subtrees are scanned in order
+                first = node >> level << level
+                for i in range(first, min(first + (2 << level) - 1, count)):
+                    if starts[i] >= end:
+                        break
+                    if start < ends[i]:
+                        found.append(self.cues[i])
+            elif not left_done:
+                left = node - (1 << (level - 1))
+                stack.append((level, node, True))
+                if left >= count or max_ends[left] > start:
+                    stack.append((level - 1, left, False))
+            elif node < count and starts[node] < end:
+                if start < ends[node]:
+                    found.append(self.cues[node])
+                stack.append((level - 1, node + (1 << (level - 1)), False))
+        return found
+
+    def at(self, time) -> list:
+        # cues on screen at time
+        return self.overlapping(time, to_us(time) + 1)
 
 
 def align_subtitles(
-    subs: Iterable[list[Subtitle, Subtitle]], min_len
-) -> Iterable[list[Subtitle, Subtitle]]:
-    aligned = []
+    subs: Iterable[list[Optional[Subtitle]]], min_len
+) -> Iterator[list[Optional[Subtitle]]]:
+    segments = ([sub and Cue.from_subtitle(sub) for sub in segment] for segment in subs)
+    return subtitle_pairs(align_cues(segments, to_us(min_len)))
+
+
+def align_cues(
+    subs: Iterable[list[Optional[Cue]]], min_len
+) -> Iterator[list[Optional[Cue]]]:
+    # short segments are dropped when every track's cue in them is also
+    # shown before or after, extending the neighbouring segments over them
     subs = iter(subs)
-    prev_prim = prev_sec = None
-    cur_prim, cur_sec = next(subs)
-
-    for next_prim, next_sec in chain(subs, [[None, None]]):
-        length = (cur_prim or cur_sec).end - (cur_prim or cur_sec).start
-        if length <= min_len:
-            can_drop_prim = redundant(cur_prim, prev_prim, next_prim)
-            can_drop_sec = redundant(cur_sec, prev_sec, next_sec)
-            if can_drop_prim and can_drop_sec:
-                adjust_prev = repeats(cur_prim, prev_prim) or repeats(cur_sec, prev_sec)
-                adjust_next = repeats(cur_prim, next_prim) or repeats(cur_sec, next_sec)
-                shift = length // 2 if adjust_prev and adjust_next else length
-                if adjust_prev:
-                    if prev_prim:
-                        prev_prim.end += shift
-                    if prev_sec:
-                        prev_sec.end += shift
-                if adjust_next:
-                    if next_prim:
-                        next_prim.start -= shift
-                    if next_sec:
-                        next_sec.start -= shift
-                cur_prim, cur_sec = next_prim, next_sec
-                continue
-        if prev_prim or prev_sec:
-            aligned.append([prev_prim, prev_sec])
-        prev_prim, prev_sec, cur_prim, cur_sec = cur_prim, cur_sec, next_prim, next_sec
-
-    if prev_prim or prev_sec:
-        aligned.append([prev_prim, prev_sec])
-    if cur_prim or cur_sec:
-        aligned.append([prev_prim, prev_sec])
-    return aligned
+    cur = next(subs, None)
+    if cur is None:
+        return
+    prev = [None] * len(cur)
+
+    for nxt in chain(subs, [[None] * len(cur)]):
+        for shown in cur:
+            if shown:
+                break
+        length = shown.end - shown.start
+        if length <= min_len and all(map(redundant, cur, prev, nxt)):
+            adjust_prev = any(map(repeats, cur, prev))
+            adjust_next = any(map(repeats, cur, nxt))
+            shift = length // 2 if adjust_prev and adjust_next else length
+            if adjust_prev:
+                for cue in prev:
+                    if cue:
+                        cue.end += shift
+            if adjust_next:
+                for cue in nxt:
+                    if cue:
+                        cue.start -= shift
+            cur = nxt
+            continue
+        if any(prev):
+            yield prev
+        prev, cur = cur, nxt
+
+    if any(prev):
+        yield prev
+
+
+def normalize(content: str) -> tuple[str, str]:
+    return extract_position(strip_font(content.strip()))
 
 
 def strip_font(text: str) -> str:
@@ -127,36 +660,38 @@ def extract_position(text: str) -> tuple[str, str]:
     return text, ""
 
 
-def redundant(sub: Optional[Subtitle], *adjacent: Optional[Subtitle]) -> bool:
-    return not sub or any(sub.content == o.content for o in adjacent if o)
+def redundant(sub: Optional[Cue], prev: Optional[Cue], nxt: Optional[Cue]) -> bool:
+    return not sub or repeats(sub, prev) or repeats(sub, nxt)
 
 
-def repeats(sub: Optional[Subtitle], other: Optional[Subtitle]) -> bool:
+def repeats(sub: Optional[Cue], other: Optional[Cue]) -> bool:
     return bool(sub and other and sub.content == other.content)
 
 
-def overlaps(
-    sub1: Subtitle, sub2: Subtitle
-) -> list[list[Optional[Subtitle], Optional[Subtitle]]]:
-    if not sub1 or not sub2:
-        return [[sub1, sub2]]
+def overlaps(*subs: Optional[Subtitle]) -> list[list[Optional[Subtitle]]]:
+    cues = [sub and Cue.from_subtitle(sub) for sub in subs]
+    if len(cues) == 2:
+        return list(subtitle_pairs(overlap_cues(*cues)))
+    return list(subtitle_pairs(sweep_cues([[cue] if cue else [] for cue in cues])))
+
+
+def overlap_cues(cue1: Optional[Cue], cue2: Optional[Cue]) -> list[list[Cue, Cue]]:
+    if not cue1 or not cue2:
+        return [[cue1, cue2]]
+    start1, end1, start2, end2 = cue1.start, cue1.end, cue2.start, cue2.end
+    if start1 < end1 <= start2 < end2:
+        return [[cue1, None], [None, cue2]]
+    if start2 < end2 <= start1 < end1:
+        return [[None, cue2], [cue1, None]]
     result = []
-    change_points = sorted({sub1.start, sub1.end, sub2.start, sub2.end})
-    for t1, t2 in pairwise(change_points):
-        s1 = (
-            Subtitle(sub1.index, t1, t2, sub1.content, sub1.proprietary)
-            if is_visible(sub1, t1, t2)
-            else None
-        )
-        s2 = (
-            Subtitle(sub2.index, t1, t2, sub2.content, sub2.proprietary)
-            if is_visible(sub2, t1, t2)
-            else None
-        )
-        if s1 or s2:
-            result.append([s1, s2])
+    change_points = sorted({start1, end1, start2, end2})
+    for t1, t2 in zip(change_points, change_points[1:]):
+        c1 = cue1.slice(t1, t2) if start1 <= t1 and t2 <= end1 else None
+        c2 = cue2.slice(t1, t2) if start2 <= t1 and t2 <= end2 else None
+        if c1 or c2:
+            result.append([c1, c2])
     return result
 
 
-def is_visible(sub: Subtitle, start, end):
+def is_visible(sub, start, end):
     return sub.start <= start and end <= sub.end
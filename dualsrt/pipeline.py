@@ -0,0 +1,361 @@
+import asyncio
+import json
+import os
+from asyncio.subprocess import DEVNULL, PIPE
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+from typing import Iterable, Optional, Sequence, Union
+
+import ffmpeg
+
+from . import mkv
+from .cache import SubtitleCache
+from .cli import (
+    finish_video,
+    known_tracks,
+    read_sidecars,
+    run_settings,
+    sidecar_streams,
+    write_dual_subtitles,
+)
+from .extract import Window, extract_native, extraction_args, select_subtitles
+from .manifest import up_to_date
+from .srtio import PARSERS
+from .stats import NO_STATS, Stats
+
+DEFAULT_PROBE_JOBS = 4
+DEFAULT_EXTRACT_JOBS = 2
+
+
+class Limits:
+    # per stage concurrency; semaphores must be created inside the event loop
+    def __init__(self, probe: int, extract: int, mux: int):
+        self.probe = asyncio.Semaphore(probe)
+        self.extract = asyncio.Semaphore(extract)
+        self.mux = asyncio.Semaphore(mux)
+
+
+async def produce_all(
+    videos: Iterable[Path],
+    arguments: dict,
+    probe_jobs=DEFAULT_PROBE_JOBS,
+    extract_jobs=DEFAULT_EXTRACT_JOBS,
+    mux_jobs: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    stats: Stats = NO_STATS,
+    streams: Optional[dict[Path, dict]] = None,
+) -> list[tuple[Path, Optional[str]]]:
+    # files move through probe, extract and mux independently, so one file's
+    # muxing overlaps the next one's extraction and the one after's probe;
+    # arguments are keyword arguments of produce_dual_subtitles and streams
+    # holds the streams already selected for some videos
+    streams = streams or {}
+    videos = list(videos)
+    mux_jobs = mux_jobs or os.cpu_count() or 1
+    limits = Limits(probe_jobs, extract_jobs, mux_jobs)
+    pool = executor or ProcessPoolExecutor(mux_jobs)
+    try:
+        errors = await asyncio.gather(
+            *(
+                try_produce(
+                    video,
+                    arguments,
+                    limits=limits,
+                    executor=pool,
+                    stats=stats,
+                    streams=streams.get(video),
+                )
+                for video in videos
+            )
+        )
+    finally:
+        if executor is None:
+            pool.shutdown()
+    return list(zip(videos, errors))
+
+
+async def try_produce(
+    video: Path,
+    arguments: dict,
+    limits: Limits,
+    executor: Executor,
+    stats: Stats = NO_STATS,
+    streams: Optional[dict[str, list[dict]]] = None,
+):
+    try:
+        with stats.stage(video, "total"):
+            await produce_dual_subtitles(
+                video,
+                **arguments,
+                limits=limits,
+                executor=executor,
+                stats=stats,
+                streams=streams,
+            )
+    except Exception as error:
+        return f"{type(error).__name__}: {error}"
+
+
+async def produce_dual_subtitles(
+    video: Path,
+    primary_lang: str,
+    secondary_lang: str,
+    output_language: str,
+    primary_font: dict,
+    secondary_font: dict,
+    cache: Optional[SubtitleCache] = None,
+    native: bool = False,
+    engine: str = "python",
+    srt_io: str = "srt",
+    force: bool = False,
+    embed: bool = False,
+    start: Optional[timedelta] = None,
+    end: Optional[timedelta] = None,
+    keep_times: bool = False,
+    sync: Optional[str] = None,
+    sidecars: Union[None, str, dict] = None,
+    mux_chunks: int = 1,
+    extra_languages: Sequence[str] = (),
+    extra_fonts: Sequence[dict] = (),
+    *,
+    limits: Limits,
+    executor: Executor,
+    stats: Stats = NO_STATS,
+    streams: Optional[dict[str, list[dict]]] = None,
+):
+    window, embedded, sidecar_paths, options = run_settings(
+        video,
+        primary_lang=primary_lang,
+        secondary_lang=secondary_lang,
+        output_language=output_language,
+        primary_font=primary_font,
+        secondary_font=secondary_font,
+        embed=embed,
+        start=start,
+        end=end,
+        keep_times=keep_times,
+        sync=sync,
+        sidecars=sidecars,
+        extra_languages=extra_languages,
+        extra_fonts=extra_fonts,
+    )
+    if not force and up_to_date(video, options):
+        return
+    subtitle_tracks, texts = {}, {}
+    if embedded:
+        async with limits.probe:
+            with stats.stage(video, "probe") as record:
+                subtitle_tracks = known_tracks(streams, embedded)
+                if subtitle_tracks is None:
+                    subtitle_tracks = await find_subtitles(
+                        video, embedded, cache, native
+                    )
+                tracks = [s["index"] for lang in subtitle_tracks.values() for s in lang]
+                record["streams"] = len(tracks)
+        async with limits.extract:
+            with stats.stage(video, "extract") as record:
+                texts = await extract_subtitle_tracks(
+                    video, *tracks, cache=cache, native=native, window=window
+                )
+                if stats.enabled:
+                    record["bytes_read"] = sum(len(t.encode()) for t in texts.values())
+    subtitle_tracks.update(sidecar_streams(sidecar_paths))
+    async with limits.mux:
+        mux = partial(
+            mux_texts,
+            video,
+            subtitle_tracks,
+            texts,
+            primary_lang=primary_lang,
+            secondary_lang=secondary_lang,
+            output_language=output_language,
+            primary_font=primary_font,
+            secondary_font=secondary_font,
+            engine=engine,
+            srt_io=srt_io,
+            window=window,
+            keep_times=keep_times,
+            sync=sync,
+            sidecars=sidecar_paths,
+            mux_chunks=mux_chunks,
+            extra_languages=extra_languages,
+            extra_fonts=extra_fonts,
+            collect_stats=stats.enabled,
+        )
+        outputs, files = await asyncio.get_running_loop().run_in_executor(executor, mux)
+    stats.merge(files)
+    if embed and outputs:
+        # remuxing reads and writes the whole video, like an extraction
+        async with limits.extract:
+            await asyncio.to_thread(
+                finish_video,
+                video,
+                options,
+                subtitle_tracks,
+                outputs,
+                embed=embed,
+                cache=cache,
+                native=native,
+                stats=stats,
+            )
+    else:
+        finish_video(video, options, subtitle_tracks, outputs)
+
+
+def mux_texts(
+    video: Path,
+    subtitle_tracks: dict[str, list[dict]],
+    texts: dict[int, str],
+    *,
+    primary_lang: str,
+    secondary_lang: str,
+    output_language: str,
+    primary_font: dict,
+    secondary_font: dict,
+    engine: str,
+    srt_io: str,
+    window: Window = None,
+    keep_times: bool = False,
+    sync: Optional[str] = None,
+    sidecars: Optional[dict[str, Path]] = None,
+    mux_chunks: int = 1,
+    extra_languages: Sequence[str] = (),
+    extra_fonts: Sequence[dict] = (),
+    collect_stats: bool = False,
+) -> tuple[list[Path], dict]:
+    # runs in the executor: parsing and muxing are the CPU-bound part; its
+    # stats travel back with the outputs
+    stats = Stats() if collect_stats else NO_STATS
+    parse = stats.parser(video, PARSERS[srt_io])
+    all_subs = {track: list(parse(text)) for track, text in texts.items()}
+    if sidecars:
+        all_subs.update(read_sidecars(video, sidecars, srt_io, stats))
+    outputs = write_dual_subtitles(
+        video,
+        subtitle_tracks,
+        all_subs,
+        primary_lang=primary_lang,
+        secondary_lang=secondary_lang,
+        output_language=output_language,
+        primary_font=primary_font,
+        secondary_font=secondary_font,
+        engine=engine,
+        srt_io=srt_io,
+        window=window,
+        keep_times=keep_times,
+        sync=sync,
+        mux_chunks=mux_chunks,
+        extra_languages=extra_languages,
+        extra_fonts=extra_fonts,
+        stats=stats,
+    )
+    return outputs, stats.files
+
+
+async def find_subtitles(
+    file: Path,
+    languages,
+    cache: Optional[SubtitleCache] = None,
+    native=False,
+) -> dict[str, list[dict]]:
+    probe = cache.load_probe(file) if cache else None
+    if probe is None:
+        probe = await probe_subtitles(file, native)
+        if cache:
+            cache.store_probe(file, probe)
+    return select_subtitles(probe, languages)
+
+
+async def probe_subtitles(file: Path, native=False) -> dict:
+    if native and mkv.is_matroska(file):
+        try:
+            return await asyncio.to_thread(mkv.probe, file)
+        except mkv.MatroskaError:
+            pass
+    # the same command line as ffmpeg.probe(file, select_streams="s")
+    args = ["ffprobe", "-show_format", "-show_streams", "-of", "json"]
+    args += ["-select_streams", "s", os.fspath(file)]
+    process = await asyncio.create_subprocess_exec(
+        *args, stdin=DEVNULL, stdout=PIPE, stderr=PIPE
+    )
+    out, err = await process.communicate()
+    if process.returncode:
+        raise ffmpeg.Error("ffprobe", out, err)
+    return json.loads(out.decode("utf-8"))
+
+
+async def extract_subtitle_tracks(
+    file: Path,
+    *tracks: int,
+    cache: Optional[SubtitleCache] = None,
+    native=False,
+    window: Window = None,
+) -> dict[int, str]:
+    extracted = {}
+    if cache:
+        extracted = {track: cache.load_track(file, track) for track in tracks}
+    missing = [track for track in tracks if extracted.get(track) is None]
+    if missing and native:
+        extracted.update(await asyncio.to_thread(extract_native, file, *missing))
+    remaining = [track for track in tracks if extracted.get(track) is None]
+    if remaining:
+        extracted.update(await run_extraction(file, *remaining, window=window))
+    if cache and window is None:
+        for track in missing:
+            cache.store_track(file, track, extracted[track])
+    return {track: extracted[track] for track in tracks}
+
+
+async def run_extraction(
+    file: Path, *tracks: int, window: Window = None
+) -> dict[int, str]:
+    pipes = {track: os.pipe() for track in tracks}
+    writes = {track: write for track, (_, write) in pipes.items()}
+    args = extraction_args(file, writes, window)
+    write_ends = [write for _, write in pipes.values()]
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args, stdin=DEVNULL, pass_fds=write_ends
+        )
+    except BaseException:
+        for read, _ in pipes.values():
+            os.close(read)
+        raise
+    finally:
+        for write in write_ends:
+            os.close(write)
+    try:
+        texts = await asyncio.gather(*(read_pipe(read) for read, _ in pipes.values()))
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+        raise
+    finally:
+        await process.wait()
+    if process.returncode:
+        raise ffmpeg.Error("ffmpeg", None, None)
+    return dict(zip(pipes, texts))
+
+
+async def read_pipe(fd: int) -> str:
+    pipe = open(fd, "rb", buffering=0)
+    reader = asyncio.StreamReader()
+    try:
+        transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), pipe
+        )
+    except BaseException:
+        pipe.close()
+        raise
+    try:
+        return (await reader.read()).decode("utf-8")
+    finally:
+        transport.close()
+
+
+def run(
+    videos: Iterable[Path], arguments: dict, **options
+) -> list[tuple[Path, Optional[str]]]:
+    return asyncio.run(produce_all(videos, arguments, **options))
@@ -0,0 +1,224 @@
+import json
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from .cache import SubtitleCache, fingerprint
+from .cli import (
+    add_cache_arguments,
+    add_language_arguments,
+    add_produce_arguments,
+    check_produce_arguments,
+    existing_file_path,
+    job_count,
+    job_fields,
+    language_sets,
+    output_path,
+    print_summary,
+    run_batch,
+    run_settings,
+    sidecar_streams,
+    stream_combos,
+    subtitle_cache,
+)
+from .manifest import up_to_date
+
+DEFAULT_PROBE_JOBS = 8
+# the parts of a probed stream that selecting streams and naming outputs use
+STREAM_KEYS = ("index", "codec_name", "tags")
+
+
+def plan_videos(
+    videos: list[Path], args, probe_jobs: int, cache: Optional[SubtitleCache]
+) -> dict:
+    # probes are mostly waiting on ffprobe, so threads run them side by side
+    with ThreadPoolExecutor(probe_jobs) as pool:
+        files = list(pool.map(lambda video: try_plan(video, args, cache), videos))
+    return {"fields": job_fields(args), "files": files}
+
+
+def try_plan(video: Path, args, cache: Optional[SubtitleCache]) -> dict:
+    try:
+        return plan_video(video, args, cache)
+    except Exception as error:
+        return {
+            "video": str(video.resolve()),
+            "error": f"{type(error).__name__}: {error}",
+        }
+
+
+def plan_video(video: Path, args, cache: Optional[SubtitleCache]) -> dict:
+    # what produce_dual_subtitles would do with the video, without extracting
+    window, embedded, sidecar_paths, options = run_settings(
+        video,
+        primary_lang=args.primary_language,
+        secondary_lang=args.secondary_language,
+        output_language=args.output_language,
+        primary_font=args.primary_font,
+        secondary_font=args.secondary_font,
+        embed=args.embed,
+        start=args.start,
+        end=args.end,
+        keep_times=args.keep_times,
+        sync=args.sync,
+        sidecars=args.sidecars,
+        extra_languages=args.extra_language,
+        extra_fonts=args.extra_font,
+    )
+    streams = {}
+    if embedded:
+        from .extract import find_subtitles
+
+        found = find_subtitles(video, embedded, cache=cache, native=args.native_mkv)
+        streams = {
+            language: [
+                {key: stream[key] for key in STREAM_KEYS if key in stream}
+                for stream in language_streams
+            ]
+            for language, language_streams in found.items()
+        }
+    subtitle_tracks = {**streams, **sidecar_streams(sidecar_paths)}
+    sets = language_sets(
+        args.primary_language, args.secondary_language, args.extra_language
+    )
+    outputs = []
+    for set_languages, chosen in stream_combos(subtitle_tracks, sets):
+        language = args.output_language or set_languages[0]
+        path = output_path(video, language, chosen, window)
+        outputs.append(
+            {
+                "path": str(path),
+                "streams": [stream["index"] for stream in chosen],
+                "exists": path.exists(),
+            }
+        )
+    sizes = [stream_bytes(s) for found in streams.values() for s in found]
+    sizes += [path.stat().st_size for path in sidecar_paths.values()]
+    return {
+        "video": str(video.resolve()),
+        "fingerprint": fingerprint(video),
+        "streams": streams,
+        "sidecars": {language: str(path) for language, path in sidecar_paths.items()},
+        "outputs": outputs,
+        "up_to_date": up_to_date(video, options),
+        # streams without a size are left out of the estimate
+        "estimated_bytes": sum(size for size in sizes if size is not None),
+        "unsized_streams": sizes.count(None),
+        "error": None,
+    }
+
+
+def stream_bytes(stream: dict) -> Optional[int]:
+    # mkvmerge's statistics tag, NUMBER_OF_BYTES or NUMBER_OF_BYTES-<language>
+    for tag, value in stream.get("tags", {}).items():
+        if tag.upper().split("-")[0] == "NUMBER_OF_BYTES":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def planned_streams(entry: dict) -> Optional[dict]:
+    # a plan's streams, unless the video changed since it was probed
+    try:
+        if entry.get("fingerprint") == fingerprint(Path(entry["video"])):
+            return entry["streams"]
+    except OSError:
+        pass
+    return None
+
+
+def run_plan(
+    plan: dict, jobs: int, cache: Optional[SubtitleCache], force=False
+) -> list[tuple[Path, Optional[str]]]:
+    from .serve import field_arguments
+
+    fields = {**plan["fields"], "force": force or plan["fields"].get("force", False)}
+    arguments = field_arguments(fields, cache)
+    videos = [Path(entry["video"]) for entry in plan["files"]]
+    streams = {
+        Path(entry["video"]): planned
+        for entry in plan["files"]
+        if (planned := planned_streams(entry)) is not None
+    }
+    return run_batch(videos, jobs, arguments, streams=streams)
+
+
+def main(argv: list[str]) -> int:
+    parser = ArgumentParser(
+        prog="dualsrt plan",
+        description="Probe videos and write which dual subtitles a run would "
+        "produce as a JSON plan for 'dualsrt run --plan'",
+    )
+    add_language_arguments(parser)
+    parser.add_argument(
+        "video_file",
+        nargs="+",
+        type=existing_file_path,
+        help="video file with the subtitle streams",
+    )
+    add_produce_arguments(parser)
+    parser.add_argument(
+        "--probe-jobs",
+        type=job_count,
+        default=DEFAULT_PROBE_JOBS,
+        help="concurrent probes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        default="-",
+        help='plan file ("-" for standard output, the default)',
+    )
+    args = parser.parse_args(argv)
+    check_produce_arguments(parser, args)
+    plan = plan_videos(args.video_file, args, args.probe_jobs, subtitle_cache(args))
+    text = json.dumps(plan, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n")
+    for entry in plan["files"]:
+        if entry["error"]:
+            print(f"{entry['video']}: {entry['error']}", file=sys.stderr)
+    return 1 if any(entry["error"] for entry in plan["files"]) else 0
+
+
+def run_main(argv: list[str]) -> int:
+    parser = ArgumentParser(
+        prog="dualsrt run",
+        description="Produce the dual subtitles of a plan written by 'dualsrt plan' "
+        "without probing the videos again",
+    )
+    parser.add_argument(
+        "--plan",
+        type=existing_file_path,
+        required=True,
+        metavar="FILE",
+        help="plan file; videos changed since it was written are probed again",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=job_count,
+        default=1,
+        help="number of files processed in parallel, 0 means one per CPU (default: 1)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="produce subtitles even for videos whose outputs are up to date",
+    )
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        plan = json.loads(args.plan.read_text())
+        results = run_plan(plan, args.jobs, subtitle_cache(args), args.force)
+    except (KeyError, TypeError, ValueError) as error:
+        parser.error(f"invalid plan {args.plan}: {error}")
+    print_summary(results)
+    return 1 if any(error for _, error in results) else 0
@@ -0,0 +1,287 @@
+import http.client
+import ipaddress
+import json
+import os
+import socket
+import sys
+from argparse import ArgumentParser
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from .cache import SubtitleCache
+from .cli import (
+    add_cache_arguments,
+    font_attributes,
+    job_count,
+    print_result,
+    produce_dual_subtitles,
+    subtitle_cache,
+)
+from .stats import Stats
+
+JOB_FIELDS = {
+    # field: default, the same as the command line's
+    "primary_language": None,
+    "secondary_language": None,
+    "output_language": None,
+    "primary_font": "",
+    "secondary_font": "color:gray",
+    "native_mkv": False,
+    "engine": "python",
+    "srt_io": "srt",
+    "force": False,
+    "embed": False,
+    "start": None,  # seconds
+    "end": None,
+    "keep_times": False,
+    "sync": None,
+    "sidecars": None,  # "auto" or {language: path}
+    "mux_chunks": 1,
+    "extra_languages": [],
+    "extra_fonts": [],  # one per extra language, like the other fonts
+}
+
+
+def default_address() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return str(Path(runtime_dir) / "dualsrt.sock")
+    return f"/tmp/dualsrt-{os.getuid()}.sock"
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def tcp_address(address: str) -> tuple[str, int]:
+    # jobs name local files and aren't authenticated, so TCP stays on loopback
+    url = urlsplit(address)
+    if url.port is None:
+        raise ValueError(f"{address} has no port")
+    try:
+        loopback = url.hostname == "localhost" or (
+            ipaddress.ip_address(url.hostname).is_loopback
+        )
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError(f"{address} is not a loopback address")
+    return url.hostname, url.port
+
+
+def connection(address: str, timeout: Optional[float] = None):
+    # http://host:port addresses use TCP, anything else is a Unix socket path
+    if address.startswith("http://"):
+        return http.client.HTTPConnection(*tcp_address(address), timeout=timeout)
+    return UnixHTTPConnection(address, timeout)
+
+
+def job_arguments(job: dict, cache: Optional[SubtitleCache]) -> tuple[Path, dict]:
+    # the video and the other keyword arguments of produce_dual_subtitles
+    if not job.get("video"):
+        raise ValueError("job field video is required")
+    fields = {field: value for field, value in job.items() if field != "video"}
+    return Path(job["video"]), field_arguments(fields, cache)
+
+
+def field_arguments(fields: dict, cache: Optional[SubtitleCache]) -> dict:
+    # keyword arguments of produce_dual_subtitles besides the video
+    unknown = set(fields) - set(JOB_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown job fields: {', '.join(sorted(unknown))}")
+    fields = {**JOB_FIELDS, **fields}
+    for required in ("primary_language", "secondary_language"):
+        if not fields.get(required):
+            raise ValueError(f"job field {required} is required")
+    fonts = [
+        font_attributes(font) if isinstance(font, str) else font
+        for font in (
+            fields["primary_font"],
+            fields["secondary_font"],
+            *fields["extra_fonts"],
+        )
+    ]
+    start, end = (
+        None if fields[time] is None else timedelta(seconds=fields[time])
+        for time in ("start", "end")
+    )
+    return {
+        "primary_lang": fields["primary_language"],
+        "secondary_lang": fields["secondary_language"],
+        "output_language": fields["output_language"],
+        "primary_font": fonts[0],
+        "secondary_font": fonts[1],
+        "cache": cache,
+        "native": fields["native_mkv"],
+        "engine": fields["engine"],
+        "srt_io": fields["srt_io"],
+        "force": fields["force"],
+        "embed": fields["embed"],
+        "start": start,
+        "end": end,
+        "keep_times": fields["keep_times"],
+        "sync": fields["sync"],
+        "sidecars": fields["sidecars"],
+        "mux_chunks": fields["mux_chunks"],
+        "extra_languages": fields["extra_languages"],
+        "extra_fonts": fonts[2:],
+    }
+
+
+def run_job(video: Path, arguments: dict) -> dict:
+    # runs in a pool process that keeps its imports and regexes between jobs
+    stats = Stats()
+    try:
+        outputs = produce_dual_subtitles(video, **arguments, stats=stats)
+        error = None
+    except Exception as exception:
+        outputs, error = None, f"{type(exception).__name__}: {exception}"
+    return {
+        "video": str(video),
+        "outputs": [str(output) for output in outputs or []],
+        "skipped": outputs is None and error is None,
+        "error": error,
+        "stats": stats.files.get(str(video), {}),
+    }
+
+
+def handler(pool, cache: Optional[SubtitleCache]):
+    class JobHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/jobs":
+                self.send_error(404)
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                job = json.loads(self.rfile.read(length))
+                video, arguments = job_arguments(job, cache)
+            except (ValueError, TypeError, AttributeError) as error:
+                self.send_error(400, explain=str(error))
+                return
+            result = pool.submit(run_job, video, arguments).result()
+            print_result(video, result["error"])
+            body = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # jobs are reported by print_result
+
+    return JobHandler
+
+
+def serve(address: str, jobs: int, cache: Optional[SubtitleCache], ready=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(jobs) as pool:
+        if address.startswith("http://"):
+            server = ThreadingHTTPServer(tcp_address(address), handler(pool, cache))
+        else:
+            if os.path.exists(address) and not is_listening(address):
+                os.unlink(address)  # left behind by a server that died
+            server = UnixHTTPServer(address, handler(pool, cache))
+        try:
+            if ready:
+                ready(server)
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if not address.startswith("http://"):
+                Path(address).unlink(missing_ok=True)
+
+
+def is_listening(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def submit(address: str, job: dict, timeout: Optional[float] = None) -> dict:
+    conn = connection(address, timeout)
+    try:
+        body = json.dumps(job)
+        conn.request("POST", "/jobs", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise ValueError(
+                f"server rejected job: {response.status} {response.reason}"
+            )
+        return json.loads(data)
+    finally:
+        conn.close()
+
+
+def submit_all(
+    address: str, videos: Iterable[Path], jobs: int, **fields
+) -> list[tuple[Path, Optional[str]]]:
+    from concurrent.futures import ThreadPoolExecutor
+
+    def submit_video(video: Path) -> Optional[str]:
+        try:
+            return submit(address, {"video": str(video.resolve()), **fields})["error"]
+        except (OSError, ValueError) as error:
+            return f"{type(error).__name__}: {error}"
+
+    videos = list(videos)
+    with ThreadPoolExecutor(jobs) as pool:
+        return list(zip(videos, pool.map(submit_video, videos)))
+
+
+def main(argv: list[str]) -> int:
+    parser = ArgumentParser(
+        prog="dualsrt serve",
+        description="Produce dual subtitles for jobs posted as JSON to /jobs",
+    )
+    parser.add_argument(
+        "address",
+        nargs="?",
+        default=default_address(),
+        help="Unix socket path or http://host:port with a loopback host to listen "
+        "on (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=job_count,
+        default=1,
+        help="number of jobs processed in parallel, 0 means one per CPU (default: 1)",
+    )
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.address.startswith("http://"):
+        try:
+            tcp_address(args.address)
+        except ValueError as error:
+            parser.error(str(error))
+    cache = subtitle_cache(args)
+
+    def ready(server):
+        print(f"listening on {args.address}", file=sys.stderr)
+
+    try:
+        serve(args.address, args.jobs, cache, ready)
+    except KeyboardInterrupt:
+        print("stopped", file=sys.stderr)
+    return 0
@@ -0,0 +1,106 @@
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+from sys import intern
+from typing import Iterable, Iterator, Union
+
+import srt
+from srt import Subtitle
+
+from .mux import Cue
+
+BOM = "\ufeff"
+DELIM = "[,.:，．。：]"
+TIMESTAMP = rf"(-?)(?:(\d+){DELIM})?(\d+){DELIM}(\d+)(?:{DELIM}(\d*))?"
+TIMING_LINE = re.compile(rf"\s*{TIMESTAMP}\s*-[ -]*>\s*{TIMESTAMP}\s?(.*)")
+INDEX_LINE = re.compile(r"\s*-?\d+(?:\.\d*)?\s*$")
+BLANK_LINES = re.compile(r"\n\n+")
+
+
+def parse(data: Union[bytes, memoryview, str]) -> Iterator[Cue]:
+    # tolerant of BOMs, CRLF, missing blank lines, blank lines inside the
+    # content, negative times and timestamps with missing milliseconds or
+    # "." and ":" separators
+    if not isinstance(data, str):
+        data = str(data, "utf-8", "replace")
+    lines = data.lstrip(BOM).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    start = end = None
+    content = []
+    for line in lines:
+        timing = TIMING_LINE.match(line) if "-" in line and ">" in line else None
+        if timing is None:
+            if start is not None:
+                content.append(line)
+            continue
+        if start is not None:
+            yield cue(start, end, content, followed=True)
+        start = microseconds(*timing.groups()[:5])
+        end = microseconds(*timing.groups()[5:10])
+        content = []
+    if start is not None:
+        yield cue(start, end, content, followed=False)
+
+
+def read_text(path: Path) -> str:
+    # both parsers take the whole text, so sidecar files are read in one go
+    return path.read_bytes().decode("utf-8-sig", "replace")
+
+
+def cue(start: int, end: int, content: list[str], followed: bool) -> Cue:
+    while content and not content[-1].strip():
+        content.pop()
+    if followed and content and INDEX_LINE.match(content[-1]):
+        content.pop()  # index line of the following block
+        while content and not content[-1].strip():
+            content.pop()
+    return Cue(start, end, intern("\n".join(content)), None)
+
+
+def microseconds(sign: str, hours, minutes, seconds, millis) -> int:
+    value = (
+        (int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)
+    ) * 1_000_000 + int(millis or 0) * 1000
+    return -value if sign else value
+
+
+def timestamp(time: timedelta) -> str:
+    minutes, seconds = divmod(time.days * 86400 + time.seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%02d:%02d:%02d,%03d" % (hours, minutes, seconds, time.microseconds // 1000)
+
+
+def numbered(subtitles: Iterable[Subtitle]) -> Iterator[tuple[int, Subtitle]]:
+    # the subtitles srt.compose keeps with their new index; they must come
+    # sorted like it sorts them, by start, end and index, as the mux yields
+    # them
+    index = 0
+    zero = timedelta(0)
+    for sub in subtitles:
+        if sub.content.strip() and zero <= sub.start < sub.end:
+            index += 1
+            yield index, sub
+
+
+def write_srt(path: Path, subtitles: Iterable[Subtitle]):
+    # same output as srt.compose, written to a temporary file that replaces
+    # path once complete
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w") as output:
+            for index, sub in numbered(subtitles):
+                content = sub.content
+                if content[0] == "\n" or "\n\n" in content:
+                    content = BLANK_LINES.sub("\n", content.strip("\n"))
+                proprietary = f" {sub.proprietary}" if sub.proprietary else ""
+                output.write(
+                    f"{index}\n{timestamp(sub.start)} --> {timestamp(sub.end)}"
+                    f"{proprietary}\n{content}\n\n"
+                )
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+PARSERS = {"srt": srt.parse, "builtin": parse}
@@ -0,0 +1,197 @@
+import json
+import os
+import resource
+import sys
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# ru_maxrss is in kilobytes everywhere but macOS
+RSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+METRICS = {
+    "seconds": "Wall time spent in the stage",
+    "bytes_read": "Subtitle bytes read in the stage",
+    "bytes_written": "Bytes written by the stage",
+    "cues_in": "Cues consumed by the stage",
+    "cues_out": "Cues produced by the stage",
+    "streams": "Subtitle streams selected by the stage",
+    "peak_rss_bytes": "Peak resident set size of the process after the stage",
+    "children_peak_rss_bytes": "Peak resident set size of ffmpeg after the stage",
+}
+
+
+def peak_rss() -> dict[str, int]:
+    return {
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        * RSS_SCALE,
+        "children_peak_rss_bytes": resource.getrusage(
+            resource.RUSAGE_CHILDREN
+        ).ru_maxrss
+        * RSS_SCALE,
+    }
+
+
+class Stats:
+    # per file, per stage counters; stages may run in extraction threads
+    enabled = True
+
+    def __init__(self):
+        self.files: dict[str, dict[str, dict]] = {}
+        self.lock = Lock()
+
+    def record(self, file: Path, stage: str) -> dict:
+        with self.lock:
+            stages = self.files.setdefault(str(file), {})
+            return stages.setdefault(stage, {"seconds": 0.0})
+
+    @contextmanager
+    def stage(
+        self, file: Path, stage: str, inside: Optional[dict] = None
+    ) -> Iterator[dict]:
+        # the time is taken out of the enclosing stage's record given as inside
+        record = self.record(file, stage)
+        started = perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = perf_counter() - started
+            with self.lock:
+                record["seconds"] += elapsed
+                if inside is not None:
+                    inside["seconds"] -= elapsed
+                record.update(peak_rss())
+
+    def add(self, file: Path, stage: str, **counters: int):
+        record = self.record(file, stage)
+        with self.lock:
+            for name, value in counters.items():
+                record[name] = record.get(name, 0) + value
+
+    def timed(
+        self,
+        file: Path,
+        stage: str,
+        items: Iterable[T],
+        inside: Optional[dict] = None,
+    ) -> Iterator[T]:
+        # times a lazy stage while it's consumed; the time is taken out of the
+        # consuming stage's record given as inside
+        record = self.record(file, stage)
+        items = iter(items)
+        count = 0
+        while True:
+            started = perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                break
+            finally:
+                elapsed = perf_counter() - started
+                record["seconds"] += elapsed
+                if inside is not None:
+                    inside["seconds"] -= elapsed
+            count += 1
+            yield item
+        self.add(file, stage, cues_out=count)
+        with self.lock:
+            record.update(peak_rss())
+
+    def parser(
+        self,
+        file: Path,
+        parse: Callable[[str], Iterable[T]],
+        inside: Optional[dict] = None,
+    ):
+        def measured_parse(text: str) -> list[T]:
+            with self.stage(file, "parse", inside):
+                cues = list(parse(text))
+            self.add(file, "parse", bytes_read=len(text.encode()), cues_out=len(cues))
+            return cues
+
+        return measured_parse
+
+    def merge(self, files: dict[str, dict[str, dict]]):
+        with self.lock:
+            for file, stages in files.items():
+                self.files.setdefault(file, {}).update(stages)
+
+    def report(self) -> dict:
+        totals = {}
+        for stages in self.files.values():
+            for stage, record in stages.items():
+                total = totals.setdefault(stage, {})
+                for name, value in record.items():
+                    if name.endswith("rss_bytes"):
+                        total[name] = max(total.get(name, 0), value)
+                    else:
+                        total[name] = total.get(name, 0) + value
+        return {"files": self.files, "totals": totals}
+
+    def write_json(self, path: str):
+        text = json.dumps(self.report(), indent=2) + "\n"
+        if path == "-":
+            sys.stdout.write(text)
+        else:
+            replace_file(Path(path), text)
+
+    def write_prometheus(self, path: Path):
+        lines = []
+        for name, description in METRICS.items():
+            samples = [
+                f'dualsrt_stage_{name}{{file="{label(file)}",stage="{stage}"}} '
+                f"{record[name]}"
+                for file, stages in self.files.items()
+                for stage, record in stages.items()
+                if name in record
+            ]
+            if samples:
+                lines.append(f"# HELP dualsrt_stage_{name} {description}.")
+                lines.append(f"# TYPE dualsrt_stage_{name} gauge")
+                lines.extend(samples)
+        replace_file(path, "".join(f"{line}\n" for line in lines))
+
+
+class NoStats(Stats):
+    # disabled instrumentation: no timers, no counters, lazy stages untouched
+    enabled = False
+
+    def __init__(self):
+        self.files = {}
+
+    def stage(self, file: Path, stage: str, inside=None):
+        return nullcontext({})
+
+    def add(self, file: Path, stage: str, **counters: int):
+        pass
+
+    def timed(self, file: Path, stage: str, items: Iterable[T], inside=None):
+        return items
+
+    def parser(self, file: Path, parse: Callable[[str], Iterable[T]], inside=None):
+        return parse
+
+    def merge(self, files: dict[str, dict[str, dict]]):
+        pass
+
+
+NO_STATS = NoStats()
+
+
+def label(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def replace_file(path: Path, text: str):
+    # textfile collectors must never see a partially written file
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(text)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
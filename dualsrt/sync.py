@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from .mux import Cue, to_us
+
+SYNC_MODES = ("offset", "drift")
+BIN = timedelta(milliseconds=100)
+# onsets of the two tracks closer than this are taken for the same line
+MATCH_TOLERANCE = timedelta(milliseconds=500)
+MIN_MATCHES = 10
+# 23.976, 24 and 25 fps releases of the same video, either way round
+FRAME_RATE_RATIOS = sorted(
+    {1.0, *(a / b for a in (24000 / 1001, 24, 25) for b in (24000 / 1001, 24, 25))}
+)
+
+
+def sync_cues(primary: list[Cue], secondary: list[Cue], mode="offset") -> list[Cue]:
+    # the secondary track retimed to the primary one
+    scale, offset = estimate_timing(primary, secondary, drift=mode == "drift")
+    if (scale, offset) == (1.0, 0):
+        return secondary
+    return retime(secondary, scale, offset)
+
+
+def estimate_timing(
+    primary: list[Cue], secondary: list[Cue], drift=False
+) -> tuple[float, int]:
+    # secondary time t shows at scale * t + offset microseconds; the coarse
+    # offset comes from cross-correlating onsets for each frame rate ratio,
+    # matched onsets then refine it, and the scale too when fitting drift
+    import numpy as np
+
+    primary_onsets = np.array([cue.start for cue in primary], np.float64)
+    secondary_onsets = np.array([cue.start for cue in secondary], np.float64)
+    if len(primary_onsets) < MIN_MATCHES or len(secondary_onsets) < MIN_MATCHES:
+        return 1.0, 0
+    primary_onsets.sort()
+    candidates = FRAME_RATE_RATIOS if drift else [1.0]
+    offset, _, scale = max(
+        (
+            (*correlate(primary_onsets, secondary_onsets * scale), scale)
+            for scale in candidates
+        ),
+        key=lambda found: found[1],
+    )
+    return refine(primary_onsets, secondary_onsets, scale, offset, drift)
+
+
+def correlate(primary_onsets, secondary_onsets) -> tuple[float, float]:
+    # (offset, score) of the best cross-correlation lag of the binned onsets
+    import numpy as np
+
+    bin_us = to_us(BIN)
+    origin = min(primary_onsets.min(), secondary_onsets.min())
+    signals = [
+        onset_signal((onsets - origin) // bin_us)
+        for onsets in (primary_onsets, secondary_onsets)
+    ]
+    size = 1 << int(len(signals[0]) + len(signals[1])).bit_length()
+    spectra = [np.fft.rfft(signal, size) for signal in signals]
+    correlation = np.fft.irfft(spectra[0] * np.conj(spectra[1]), size)
+    lag = int(np.argmax(correlation))
+    score = float(correlation[lag])
+    if lag >= len(signals[0]):
+        lag -= size  # negative lags wrap around
+    return lag * bin_us, score
+
+
+def onset_signal(bins):
+    # onsets spread over neighbouring bins, so near matches still correlate
+    import numpy as np
+
+    signal = np.bincount(bins.astype(np.int64))
+    return np.convolve(signal, np.ones(5), "same")
+
+
+def refine(primary_onsets, secondary_onsets, scale, offset, drift):
+    import numpy as np
+
+    secondary_onsets = np.sort(secondary_onsets)
+    shifted = secondary_onsets * scale + offset
+    right = np.clip(
+        np.searchsorted(primary_onsets, shifted), 1, len(primary_onsets) - 1
+    )
+    left = right - 1
+    nearest = np.where(
+        shifted - primary_onsets[left] <= primary_onsets[right] - shifted, left, right
+    )
+    matched = np.abs(primary_onsets[nearest] - shifted) <= to_us(MATCH_TOLERANCE)
+    if matched.sum() < MIN_MATCHES:
+        return scale, int(round(offset))
+    source, target = secondary_onsets[matched], primary_onsets[nearest[matched]]
+    if drift:
+        scale, offset = np.polyfit(source, target, 1)
+    else:
+        offset = np.median(target - source * scale)
+    return float(scale), int(round(offset))
+
+
+def retime(cues: list[Cue], scale: float, offset: int) -> list[Cue]:
+    # cues that would start before zero are cut or dropped
+    retimed = []
+    for cue in cues:
+        end = round(cue.end * scale) + offset
+        if end > 0:
+            start = max(round(cue.start * scale) + offset, 0)
+            retimed.append(cue.slice(start, end))
+    return retimed
@@ -0,0 +1,290 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from threading import Event
+from typing import Callable, Iterable, Optional
+
+from .cli import (
+    add_language_arguments,
+    add_produce_arguments,
+    check_produce_arguments,
+    print_result,
+    produce_arguments,
+    try_produce,
+)
+
+VIDEO_SUFFIXES = {".avi", ".m2ts", ".m4v", ".mkv", ".mov", ".mp4", ".ts", ".webm"}
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 5.0
+
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_video(path: Path) -> bool:
+    return path.suffix.lower() in VIDEO_SUFFIXES and not path.name.startswith(".")
+
+
+def signature(path: Path) -> Optional[tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def scan(directories: Iterable[Path]) -> dict[Path, tuple[int, int]]:
+    files = {}
+    for directory in directories:
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = Path(root, name)
+                if is_video(path) and (sig := signature(path)):
+                    files[path] = sig
+    return files
+
+
+class InotifyWatcher:
+    def __init__(self, directories: Iterable[Path]):
+        self.directories = list(directories)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: dict[int, Path] = {}
+        try:
+            for directory in self.directories:
+                self.add_tree(directory)
+        except BaseException:
+            self.close()
+            raise
+
+    def add_tree(self, directory: Path) -> list[Path]:
+        # watches directory and its subdirectories, returning the files found
+        files = []
+        for root, _, names in os.walk(directory):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"can't watch {root}")
+            self.watches[wd] = Path(root)
+            files.extend(Path(root, name) for name in names)
+        return files
+
+    def changes(self, timeout: Optional[float]) -> list[Path]:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        changed = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    changed.extend(scan(self.directories))
+                elif mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                elif wd in self.watches:
+                    path = self.watches[wd] / os.fsdecode(name)
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            changed.extend(self.add_tree(path))
+                    else:
+                        changed.append(path)
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PollingWatcher:
+    # for filesystems without inotify support, e.g. network shares
+    def __init__(self, directories: Iterable[Path], interval=DEFAULT_POLL_INTERVAL):
+        self.directories = list(directories)
+        self.interval = interval
+        self.files = scan(self.directories)
+        self.next_scan = time.monotonic() + interval
+
+    def changes(self, timeout: Optional[float]) -> list[Path]:
+        wait = self.next_scan - time.monotonic()
+        if timeout is not None and timeout < wait:
+            time.sleep(max(timeout, 0))
+            return []
+        time.sleep(max(wait, 0))
+        self.next_scan = time.monotonic() + self.interval
+        files = scan(self.directories)
+        changed = [path for path, sig in files.items() if self.files.get(path) != sig]
+        self.files = files
+        return changed
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_watcher(directories: list[Path], poll_interval: Optional[float] = None):
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(directories)
+        except (AttributeError, OSError, TypeError):
+            poll_interval = DEFAULT_POLL_INTERVAL
+    return PollingWatcher(directories, poll_interval)
+
+
+class Debouncer:
+    # a file is ready once it kept its size and mtime for settle seconds
+    def __init__(
+        self, settle=DEFAULT_SETTLE, clock: Callable[[], float] = time.monotonic
+    ):
+        self.settle = settle
+        self.clock = clock
+        self.pending: dict[Path, tuple[float, Optional[tuple[int, int]]]] = {}
+
+    def touch(self, path: Path):
+        self.pending[path] = (self.clock() + self.settle, signature(path))
+
+    def ready(self) -> list[Path]:
+        now = self.clock()
+        settled = []
+        for path, (deadline, sig) in list(self.pending.items()):
+            if now < deadline:
+                continue
+            current = signature(path)
+            if current is None:
+                del self.pending[path]
+            elif current != sig:
+                self.pending[path] = (now + self.settle, current)
+            else:
+                settled.append(path)
+                del self.pending[path]
+        return settled
+
+    def timeout(self) -> Optional[float]:
+        if not self.pending:
+            return None
+        deadline = min(deadline for deadline, _ in self.pending.values())
+        return max(deadline - self.clock(), 0)
+
+
+def watch(
+    directories: list[Path],
+    jobs: int,
+    arguments: dict,
+    settle=DEFAULT_SETTLE,
+    poll_interval: Optional[float] = None,
+    existing=False,
+    stop: Optional[Event] = None,
+    report: Callable[[Path, Optional[str]], None] = print_result,
+):
+    # arguments are keyword arguments of produce_dual_subtitles; videos
+    # changed while being processed are queued again once done
+    stop = stop or Event()
+    debouncer = Debouncer(settle)
+    queue: deque[Path] = deque()
+    running: dict[Path, Future] = {}
+    changed_while_running: set[Path] = set()
+    watcher = open_watcher(directories, poll_interval)
+    with watcher, ProcessPoolExecutor(jobs) as pool:
+        if existing:
+            for path in scan(directories):
+                debouncer.touch(path)
+        while not stop.is_set():
+            timeout = debouncer.timeout()
+            timeout = 0.5 if timeout is None else min(timeout, 0.5)
+            for path in watcher.changes(timeout):
+                if not is_video(path):
+                    continue
+                if path in running:
+                    changed_while_running.add(path)
+                else:
+                    debouncer.touch(path)
+            for path, future in list(running.items()):
+                if future.done():
+                    del running[path]
+                    report(path, future.result())
+                    if path in changed_while_running:
+                        changed_while_running.discard(path)
+                        debouncer.touch(path)
+            queue.extend(path for path in debouncer.ready() if path not in queue)
+            while queue and len(running) < jobs:
+                path = queue.popleft()
+                running[path] = pool.submit(try_produce, path, arguments)
+
+
+def main(argv: list[str]) -> int:
+    parser = ArgumentParser(
+        prog="dualsrt watch",
+        description="Produce dual subtitles for videos as they appear in directories",
+    )
+    add_language_arguments(parser)
+    parser.add_argument(
+        "directory",
+        nargs="+",
+        type=Path,
+        help="directory watched for new or changed videos, including subdirectories",
+    )
+    add_produce_arguments(parser)
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEFAULT_SETTLE,
+        help="seconds a video must stay unchanged before it's processed "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        metavar="SECONDS",
+        help="scan the directories at this interval instead of using inotify",
+    )
+    parser.add_argument(
+        "--existing",
+        action="store_true",
+        help="also process the videos already in the directories",
+    )
+    args = parser.parse_args(argv)
+    check_produce_arguments(parser, args)
+    for directory in args.directory:
+        if not directory.is_dir():
+            parser.error(f"directory {directory} does not exist")
+    try:
+        watch(
+            args.directory,
+            args.jobs,
+            produce_arguments(args),
+            settle=args.settle,
+            poll_interval=args.poll,
+            existing=args.existing,
+        )
+    except KeyboardInterrupt:
+        print("stopped", file=sys.stderr)
+    return 0
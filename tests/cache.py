@@ -0,0 +1,48 @@
+from dualsrt.cache import SubtitleCache
+
+
+def test_cache_roundtrip(tmp_path):
+    video = tmp_path / "video.mkv"
+    video.write_bytes(b"video")
+    cache = SubtitleCache(tmp_path / "cache")
+    assert cache.load_probe(video) is None
+    assert cache.load_track(video, 3) is None
+    cache.store_probe(video, {"streams": []})
+    cache.store_track(video, 3, "1\n00:00:01,000 --> 00:00:02,000\na\n\n")
+    assert cache.load_probe(video) == {"streams": []}
+    assert cache.load_track(video, 3) == "1\n00:00:01,000 --> 00:00:02,000\na\n\n"
+
+
+def test_cache_invalidated_on_change(tmp_path):
+    video = tmp_path / "video.mkv"
+    video.write_bytes(b"video")
+    cache = SubtitleCache(tmp_path / "cache")
+    cache.store_track(video, 3, "text")
+    video.write_bytes(b"changed video")
+    assert cache.load_track(video, 3) is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    videos = [tmp_path / f"video{i}.mkv" for i in range(3)]
+    cache = SubtitleCache(tmp_path / "cache", max_size=25)
+    for video in videos:
+        video.write_bytes(video.name.encode())
+        cache.store_track(video, 0, "x" * 10)
+    assert cache.load_track(videos[0], 0) is None
+    assert cache.load_track(videos[1], 0) == "x" * 10
+    assert cache.load_track(videos[2], 0) == "x" * 10
+
+
+def test_cache_counts_entries_only_to_evict(tmp_path, monkeypatch):
+    cache = SubtitleCache(tmp_path / "cache", max_size=45)
+    evict, evicted = cache.evict, []
+    monkeypatch.setattr(cache, "evict", lambda: evicted.append(1) or evict())
+    videos = [tmp_path / f"video{i}.mkv" for i in range(5)]
+    for video in videos:
+        video.write_bytes(video.name.encode())
+        cache.store_track(video, 0, "x" * 10)
+    # once for the unknown total of a new cache, then when it exceeds max_size
+    assert len(evicted) == 2
+    assert cache.load_track(videos[0], 0) is None
+    assert all(cache.load_track(video, 0) for video in videos[1:])
+    assert (tmp_path / "cache" / ".size").read_text() == "40"
@@ -0,0 +1,234 @@
+from argparse import ArgumentTypeError
+from copy import deepcopy
+from datetime import timedelta as td
+from io import StringIO
+from pathlib import Path
+
+import pytest
+import srt
+from srt import Subtitle
+
+from benchmarks.synthetic import fake_video, synthetic_pair, synthetic_track
+from dualsrt import extract
+from dualsrt.cli import (
+    language_pairs,
+    language_sets,
+    main,
+    run_batch,
+    print_summary,
+    time_offset,
+    try_produce,
+    write_subtitles,
+)
+from dualsrt.extract import run_extraction
+from dualsrt.mux import clip_window, dual_subtitles, stacked_subtitles
+
+
+def test_run_batch_keeps_going_after_failures(tmp_path, pair):
+    videos = [tmp_path / "missing1.mkv", tmp_path / "missing2.mkv"]
+    results = run_batch(videos, 1, pair)
+    assert [video for video, _ in results] == videos
+    assert all(error for _, error in results)
+
+
+def test_run_batch_parallel_matches_sequential(tmp_path, pair, fake_library):
+    videos = fake_library(3)
+    written = {}
+    for jobs in (1, 2):
+        for path in tmp_path.glob("*.srt"):
+            path.unlink()
+        assert run_batch(videos, jobs, pair) == [(video, None) for video in videos]
+        written[jobs] = {
+            path.name: path.read_bytes() for path in tmp_path.glob("*.srt")
+        }
+    assert len(written[1]) == 3
+    assert written[2] == written[1]
+
+
+def test_print_summary(capsys):
+    print_summary([(Path("a.mkv"), None), (Path("b.mkv"), "Error: boom")])
+    assert capsys.readouterr().err.splitlines() == [
+        "a.mkv: ok",
+        "b.mkv: FAILED: Error: boom",
+        "1 succeeded, 1 failed",
+    ]
+
+
+def test_write_subtitles_matches_compose():
+    primary = [
+        Subtitle(None, td(seconds=i), td(seconds=i + 2), f"p{i}")
+        for i in range(0, 20, 3)
+    ]
+    secondary = [
+        Subtitle(None, td(seconds=i), td(seconds=i + 1), f"s{i}")
+        for i in range(1, 20, 2)
+    ]
+    expected = srt.compose(
+        dual_subtitles(deepcopy(primary), deepcopy(secondary), {}, {})
+    )
+    output = StringIO()
+    write_subtitles(output, dual_subtitles(primary, secondary, {}, {}))
+    assert output.getvalue() == expected
+
+
+def test_write_subtitles_matches_compose_with_overlapping_cues():
+    primary, secondary = synthetic_pair(200, 1, overlap=0.3)
+    expected = srt.compose(
+        dual_subtitles(deepcopy(primary), deepcopy(secondary), {}, {})
+    )
+    output = StringIO()
+    write_subtitles(output, dual_subtitles(primary, secondary, {}, {}))
+    assert output.getvalue() == expected
+
+
+def test_write_subtitles_overlapping_primary():
+    primary = [
+        Subtitle(None, td(seconds=1), td(seconds=10), "sign"),
+        Subtitle(None, td(seconds=2), td(seconds=3), "hello"),
+    ]
+    secondary = [Subtitle(None, td(seconds=1), td(seconds=5), "privet")]
+    expected = srt.compose(
+        dual_subtitles(deepcopy(primary), deepcopy(secondary), {}, {})
+    )
+    output = StringIO()
+    write_subtitles(output, dual_subtitles(primary, secondary, {}, {}))
+    assert output.getvalue() == expected
+    written = srt.parse(output.getvalue())
+    assert [(sub.start.seconds, sub.end.seconds) for sub in written] == [
+        (1, 5),
+        (2, 3),
+        (5, 10),
+    ]
+
+
+def test_language_pairs():
+    assert language_pairs("eng", "rus") == [("eng", "rus")]
+    assert language_pairs("eng", "rus,ukr,eng") == [("eng", "rus"), ("eng", "ukr")]
+    assert language_pairs("eng,fra", "rus") == [("eng", "rus"), ("fra", "rus")]
+
+
+def test_language_sets():
+    assert language_sets("eng", "rus") == [("eng", "rus")]
+    assert language_sets("eng", "rus,ukr", ["ukr", "fra"]) == [
+        ("eng", "rus", "ukr", "fra"),
+        ("eng", "ukr", "fra"),
+    ]
+
+
+def test_several_secondary_languages_share_one_extraction(
+    tmp_path, monkeypatch, pair, fake_ffmpeg
+):
+    english, russian = synthetic_pair(20, 1)
+    ukrainian = synthetic_track(20, 2, "ukrainian")
+    tracks = {"eng": [english], "rus": [russian], "ukr": [ukrainian]}
+    video = fake_video(tmp_path / "video.mkv", tracks)
+    extractions = []
+    monkeypatch.setattr(
+        extract,
+        "run_extraction",
+        lambda *args, **kwargs: extractions.append(args[2:])
+        or run_extraction(*args, **kwargs),
+    )
+    assert try_produce(video, {**pair, "secondary_lang": "rus,ukr"}) is None
+    assert extractions == [(1, 2, 3)]
+    assert sorted(path.name for path in tmp_path.glob("*.srt")) == [
+        "video.eng.dual_eng_rus.srt",
+        "video.eng.dual_eng_ukr.srt",
+    ]
+
+
+def test_extra_languages(tmp_path, monkeypatch, fake_ffmpeg):
+    english, russian = synthetic_pair(20, 1)
+    ukrainian = synthetic_track(20, 2, "ukrainian")
+    tracks = {"eng": [english], "rus": [russian], "ukr": [ukrainian]}
+    video = fake_video(tmp_path / "video.mkv", tracks)
+    extractions = []
+    monkeypatch.setattr(
+        extract,
+        "run_extraction",
+        lambda *args, **kwargs: extractions.append(args[2:])
+        or run_extraction(*args, **kwargs),
+    )
+    argv = ["eng", "rus", str(video), "--no-cache", "--extra-language", "ukr"]
+    assert main(argv + ["--extra-font", "color:yellow"]) == 0
+    assert extractions == [(1, 2, 3)]
+    fonts = [{}, {"color": "gray"}, {"color": "yellow"}]
+    expected = stacked_subtitles([english, russian, ukrainian], fonts)
+    output = tmp_path / "video.eng.dual_eng_rus_ukr.srt"
+    assert output.read_text() == srt.compose(expected)
+
+
+def test_time_offset():
+    assert time_offset("90") == td(seconds=90)
+    assert time_offset("1:30.5") == td(seconds=90.5)
+    assert time_offset("01:00:00") == td(hours=1)
+    for text in ("", "-1", "1:2:3:4", "nan", "a:00"):
+        with pytest.raises(ArgumentTypeError):
+            time_offset(text)
+
+
+def test_time_window(tmp_path, fake_ffmpeg):
+    primary, secondary = synthetic_pair(200, 1)
+    video = fake_video(tmp_path / "video.mkv", {"eng": [primary], "rus": [secondary]})
+    argv = ["eng", "rus", str(video), "--no-cache"]
+    assert main(argv) == 0
+    whole = (tmp_path / "video.eng.dual_eng_rus.srt").read_text()
+    start, end = td(seconds=200), td(seconds=400)
+    window_argv = argv + ["--start", "3:20", "--end", "400", "--force"]
+    for keep_times in (True, False):
+        assert main(window_argv + ["--keep-times"] * keep_times) == 0
+        clipped = clip_window(srt.parse(whole), start, end, keep_times)
+        window = (tmp_path / "video.eng.dual_eng_rus.200-400.srt").read_text()
+        assert window == srt.compose(clipped)
+    with pytest.raises(SystemExit):
+        main(argv + ["--start", "10", "--end", "5"])
+
+
+def test_mux_chunks_match_serial_mux(tmp_path, fake_ffmpeg):
+    primary, secondary = synthetic_pair(200, 1)
+    video = fake_video(tmp_path / "video.mkv", {"eng": [primary], "rus": [secondary]})
+    output = tmp_path / "video.eng.dual_eng_rus.srt"
+    assert main(["eng", "rus", str(video), "--no-cache"]) == 0
+    serial = output.read_text()
+    argv = ["eng", "rus", str(video), "--no-cache", "--mux-chunks", "3"]
+    assert main(argv + ["--force"]) == 0
+    assert output.read_text() == serial
+    # the chunks don't change the output, so it stays up to date
+    written = output.stat().st_mtime_ns
+    assert main(argv[:-2]) == 0
+    assert output.stat().st_mtime_ns == written
+
+
+def test_sidecars_need_no_ffmpeg(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", "")
+    primary, secondary = synthetic_pair(20, 1)
+    video = tmp_path / "video.mkv"
+    video.write_bytes(b"video")
+    (tmp_path / "video.eng.srt").write_text(srt.compose(primary))
+    (tmp_path / "video.rus.srt").write_text(srt.compose(secondary))
+    output = tmp_path / "video.eng.dual_eng_rus.srt"
+    assert main(["eng", "rus", str(video), "--sidecars", "--no-cache"]) == 0
+    expected = list(dual_subtitles(primary, secondary, {}, {"color": "gray"}))
+    assert output.read_text() == srt.compose(expected)
+    produced = output.stat().st_mtime_ns
+    assert main(["eng", "rus", str(video), "--sidecars", "--no-cache"]) == 0
+    assert output.stat().st_mtime_ns == produced
+    (tmp_path / "video.rus.srt").write_text(srt.compose(secondary[:10]))
+    assert main(["eng", "rus", str(video), "--sidecars", "--no-cache"]) == 0
+    assert output.stat().st_mtime_ns != produced
+
+
+def test_sidecars_fall_back_to_streams(tmp_path, fake_ffmpeg):
+    primary, secondary = synthetic_pair(20, 1)
+    other = synthetic_track(20, 2, "other")
+    video = fake_video(tmp_path / "video.mkv", {"eng": [other], "rus": [secondary]})
+    sidecar = tmp_path / "english.srt"
+    sidecar.write_text(srt.compose(primary))
+    expected = srt.compose(dual_subtitles(primary, secondary, {}, {"color": "gray"}))
+    argv = ["eng", "rus", str(video), "--no-cache", "--primary-srt", str(sidecar)]
+    assert main(argv) == 0
+    assert (tmp_path / "video.eng.dual_eng_rus.srt").read_text() == expected
+    sidecar.rename(tmp_path / "video.eng.srt")
+    argv = ["eng", "rus", str(video), "--no-cache", "--sidecars", "--force"]
+    assert main(argv) == 0
+    assert (tmp_path / "video.eng.dual_eng_rus.srt").read_text() == expected
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from benchmarks.fake_ffmpeg import install
+from benchmarks.synthetic import fake_video, synthetic_pair
+from dualsrt.cache import SubtitleCache
+
+TRACK = "1\n00:00:01,000 --> 00:00:02,000\na\n\n2\n00:00:03,000 --> 00:00:04,000\nb\n\n"
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    # tests that leave the cache on must not fill the user's own
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg-cache"))
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    install(bindir)
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    return bindir
+
+
+@pytest.fixture
+def fake_library(tmp_path, fake_ffmpeg):
+    def make(count):
+        videos = []
+        for seed in range(count):
+            primary, secondary = synthetic_pair(50, seed)
+            tracks = {"eng": [primary], "rus": [secondary]}
+            videos.append(fake_video(tmp_path / f"video{seed}.mkv", tracks))
+        return videos
+
+    return make
+
+
+@pytest.fixture
+def pair():
+    # keyword arguments of produce_dual_subtitles for an eng+rus pair
+    return {
+        "primary_lang": "eng",
+        "secondary_lang": "rus",
+        "output_language": None,
+        "primary_font": {},
+        "secondary_font": {},
+    }
+
+
+@pytest.fixture
+def video_cache(tmp_path):
+    return SubtitleCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def cache_subtitles(video_cache):
+    # a cached probe and tracks let produce_dual_subtitles skip ffmpeg
+    def store(video):
+        streams = [
+            {"index": 2, "codec_name": "subrip", "tags": {"language": "eng"}},
+            {"index": 3, "codec_name": "subrip", "tags": {"language": "rus"}},
+        ]
+        video_cache.store_probe(video, {"streams": streams})
+        video_cache.store_track(video, 2, TRACK)
+        video_cache.store_track(video, 3, TRACK)
+
+    return store
+
+
+@pytest.fixture
+def cached_video(tmp_path, cache_subtitles):
+    video = tmp_path / "video.mkv"
+    video.write_bytes(b"video")
+    cache_subtitles(video)
+    return video
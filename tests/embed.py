@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+
+from benchmarks.synthetic import fake_video, synthetic_pair
+from dualsrt.cli import try_produce
+from dualsrt.embed import output_tags
+
+
+def test_output_tags():
+    video = Path("Show.S01E01.mkv")
+    output = Path("Show.S01E01.eng.dual_english_russian.srt")
+    assert output_tags(video, output) == ("eng", "dual_english_russian")
+
+
+def test_embed_replaces_earlier_dual_streams(tmp_path, pair, fake_ffmpeg):
+    primary, secondary = synthetic_pair(20, 1)
+    video = fake_video(tmp_path / "video.mkv", {"eng": [primary], "rus": [secondary]})
+    arguments = {**pair, "embed": True}
+    for force in (False, True):
+        assert try_produce(video, {**arguments, "force": force}) is None
+        streams = json.loads(video.read_text())["streams"]
+        assert [stream["tags"] for stream in streams] == [
+            {"language": "eng"},
+            {"language": "rus"},
+            {"language": "eng", "title": "dual_eng_rus"},
+        ]
+    embedded = json.loads(video.read_text())["tracks"]["3"]
+    assert embedded == (tmp_path / "video.eng.dual_eng_rus.srt").read_text()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        ".video.mkv.dualsrt.json",
+        "bin",
+        "video.eng.dual_eng_rus.srt",
+        "video.mkv",
+    ]
+    remuxed = video.stat().st_mtime_ns
+    assert try_produce(video, arguments) is None
+    assert video.stat().st_mtime_ns == remuxed
@@ -1,5 +1,7 @@
-from dualsrt.extract import find_subtitles, extract_subtitle_tracks
+from dualsrt.extract import find_subtitles, extract_subtitle_tracks, parse_stream
+from io import StringIO
 from pathlib import Path
+import srt
 
 
 TEST_DATA = Path(__file__).parent.parent / "testdata"
@@ -46,3 +48,11 @@ def test_extract_english_track_f1():
     subs = extract_subtitle_tracks(input_file, 15, 13)
 
     assert subs
+
+
+def test_parse_stream_matches_srt_parse():
+    text = "".join(
+        f"{i}\n00:00:{i:02},000 --> 00:00:{i:02},500\nline {i}\n\nsecond\n\n"
+        for i in range(1, 40)
+    )
+    assert list(parse_stream(StringIO(text), chunk_size=7)) == list(srt.parse(text))
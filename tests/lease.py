@@ -0,0 +1,70 @@
+import os
+import time
+from argparse import ArgumentTypeError
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import fake_video, synthetic_pair
+from dualsrt.cli import lease_ttl, run_batch, shard_spec
+from dualsrt.lease import Lease, claim, lease_path, shard_order
+
+
+def test_shards_partition_videos():
+    videos = [Path(f"/library/video{n}.mkv") for n in range(50)]
+    shards = [shard_order(videos, index, 3) for index in range(3)]
+    assert sorted(video for shard in shards for video in shard) == sorted(videos)
+    assert all(shards)
+    assert shard_order(videos, 1, 3, rest=True)[: len(shards[1])] == shards[1]
+    assert sorted(shard_order(videos, 1, 3, rest=True)) == sorted(videos)
+    assert shard_spec("2/3") == (1, 3)
+    for text in ("0/3", "4/3", "1", "a/b"):
+        with pytest.raises(ArgumentTypeError):
+            shard_spec(text)
+
+
+def test_lease_ttl_must_be_positive(tmp_path):
+    assert lease_ttl("0.5") == 0.5
+    for text in ("0", "-1", "nan", "inf", "soon"):
+        with pytest.raises(ArgumentTypeError):
+            lease_ttl(text)
+    with pytest.raises(ValueError):
+        Lease(tmp_path / "video.mkv", 0)
+
+
+def test_lease_is_exclusive_until_released(tmp_path):
+    video = tmp_path / "video.mkv"
+    first, second = Lease(video, 60), Lease(video, 60)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert not lease_path(video).exists()
+    assert second.acquire()
+    second.release()
+
+
+def test_stale_lease_is_taken_over(tmp_path):
+    video = tmp_path / "video.mkv"
+    lease_path(video).write_text("crashed node")
+    stale = time.time() - 120
+    os.utime(lease_path(video), (stale, stale))
+    with claim(video, 60) as claimed:
+        assert claimed
+        with claim(video, 60) as other:
+            assert not other
+    assert not lease_path(video).exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_run_batch_skips_claimed_videos(tmp_path, pair, fake_ffmpeg):
+    videos = []
+    for seed in range(2):
+        primary, secondary = synthetic_pair(20, seed)
+        tracks = {"eng": [primary], "rus": [secondary]}
+        videos.append(fake_video(tmp_path / f"video{seed}.mkv", tracks))
+    lease_path(videos[0]).write_text("another node")
+    assert run_batch(videos, 1, pair, lease_ttl=60) == [(videos[1], None)]
+    assert not (tmp_path / "video0.eng.dual_eng_rus.srt").exists()
+    assert (tmp_path / "video1.eng.dual_eng_rus.srt").exists()
+    assert lease_path(videos[0]).read_text() == "another node"
+    assert not lease_path(videos[1]).exists()
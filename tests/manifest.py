@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from dualsrt.cli import try_produce
+from dualsrt.manifest import manifest_path, up_to_date
+
+
+@pytest.fixture
+def produced_video(pair, video_cache, cached_video):
+    assert try_produce(cached_video, {**pair, "cache": video_cache}) is None
+    return cached_video
+
+
+def test_up_to_date_video_is_skipped(monkeypatch, pair, produced_video):
+    # without a cache anything but a skip needs ffprobe, which is hidden here
+    monkeypatch.setenv("PATH", "")
+    assert try_produce(produced_video, pair) is None
+    assert manifest_path(produced_video).exists()
+
+
+def test_changes_rebuild(tmp_path, monkeypatch, pair, produced_video):
+    monkeypatch.setenv("PATH", "")
+    assert try_produce(produced_video, {**pair, "secondary_lang": "ukr"})
+    assert try_produce(produced_video, {**pair, "secondary_font": {"color": "red"}})
+    assert try_produce(produced_video, {**pair, "force": True})
+    (tmp_path / "video.eng.dual_eng_rus.srt").unlink()
+    assert try_produce(produced_video, pair)
+
+
+def test_changed_source_rebuilds(monkeypatch, pair, produced_video):
+    monkeypatch.setenv("PATH", "")
+    produced_video.write_bytes(b"new video")
+    assert try_produce(produced_video, pair)
+
+
+def test_malformed_manifest_is_not_up_to_date(monkeypatch, produced_video):
+    monkeypatch.setenv("PATH", "")
+    manifest = json.loads(manifest_path(produced_video).read_text())
+    assert up_to_date(produced_video, manifest["options"])
+    for broken in ([], "manifest", {**manifest, "outputs": None}, {"source": 1}):
+        manifest_path(produced_video).write_text(json.dumps(broken))
+        assert not up_to_date(produced_video, manifest["options"])
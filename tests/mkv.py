@@ -0,0 +1,119 @@
+import zlib
+from datetime import timedelta
+
+import srt
+
+from dualsrt.mkv import ass_to_srt, extract_tracks, is_matroska, probe
+
+
+def element(element_id: int, payload: bytes) -> bytes:
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return id_bytes + (len(payload) | 1 << 56).to_bytes(8, "big") + payload
+
+
+def uint(element_id: int, value: int) -> bytes:
+    return element(element_id, value.to_bytes(4, "big"))
+
+
+def string(element_id: int, value: str) -> bytes:
+    return element(element_id, value.encode())
+
+
+def block(track: int, time: int, duration: int, payload: bytes) -> bytes:
+    header = bytes([0x80 | track]) + time.to_bytes(2, "big") + b"\0"
+    return element(0xA0, element(0xA1, header + payload) + uint(0x9B, duration))
+
+
+def matroska_file(path):
+    tracks = element(
+        0x1654AE6B,
+        element(0xAE, uint(0xD7, 1) + uint(0x83, 1) + string(0x86, "V_TEST"))
+        + element(
+            0xAE,
+            uint(0xD7, 2)
+            + uint(0x83, 0x11)
+            + string(0x86, "S_TEXT/UTF8")
+            + string(0x22B59C, "rus"),
+        )
+        + element(
+            0xAE,
+            uint(0xD7, 3)
+            + uint(0x83, 0x11)
+            + string(0x86, "S_TEXT/ASS")
+            + string(0x536E, "Full")
+            + element(0x6D80, element(0x6240, element(0x5034, uint(0x4254, 0)))),
+        ),
+    )
+    ass = zlib.compress(b"1,0,Default,,0,0,0,,{\\i1}two{\\i0}\\Nlines")
+    cluster = element(
+        0x1F43B675,
+        uint(0xE7, 1000)
+        + element(0xA3, b"\x81\0\0\x80" + b"video" * 100)
+        + block(2, 0, 500, "привет".encode())
+        + block(3, 200, 1000, ass),
+    )
+    info = element(0x1549A966, uint(0x2AD7B1, 1_000_000))
+    segment = element(0x18538067, info + tracks + cluster)
+    path.write_bytes(element(0x1A45DFA3, string(0x4282, "matroska")) + segment)
+    return path
+
+
+def test_probe(tmp_path):
+    file = matroska_file(tmp_path / "test.mkv")
+    assert is_matroska(file)
+    streams = probe(file)["streams"]
+    assert [s["index"] for s in streams] == [1, 2]
+    assert [s["codec_name"] for s in streams] == ["subrip", "ass"]
+    assert streams[0]["tags"] == {"language": "rus"}
+    assert streams[1]["tags"] == {"language": "eng", "title": "Full"}
+
+
+def test_extract_tracks(tmp_path):
+    file = matroska_file(tmp_path / "test.mkv")
+    tracks = extract_tracks(file, 0, 1, 2)
+    assert tracks.keys() == {1, 2}
+    assert list(srt.parse(tracks[1])) == [
+        srt.Subtitle(1, timedelta(seconds=1), timedelta(seconds=1.5), "привет")
+    ]
+    assert list(srt.parse(tracks[2])) == [
+        srt.Subtitle(
+            1, timedelta(seconds=1.2), timedelta(seconds=2.2), "<i>two</i>\nlines"
+        )
+    ]
+
+
+def test_extract_tracks_follows_cues(tmp_path):
+    # blocks listed in Cues are read directly: the cluster in between, whose
+    # video block is not even valid, is never walked
+    tracks = element(
+        0x1654AE6B,
+        element(0xAE, uint(0xD7, 1) + uint(0x83, 0x11) + string(0x86, "S_TEXT/UTF8")),
+    )
+    first = element(0x1F43B675, uint(0xE7, 0) + block(1, 0, 500, b"one"))
+    video = element(0x1F43B675, uint(0xE7, 1000) + element(0xA3, b"\0broken"))
+    last = element(0x1F43B675, uint(0xE7, 2000) + block(1, 0, 500, b"two"))
+
+    def cues(*clusters: int) -> bytes:
+        points = b"".join(
+            element(0xBB, element(0xB7, uint(0xF7, 1) + uint(0xF1, c) + uint(0xF0, 13)))
+            for c in clusters
+        )
+        return element(0x1C53BB6B, points)
+
+    head = len(tracks + cues(0, 0))
+    clusters = (head, head + len(first + video))
+    segment = element(0x18538067, tracks + cues(*clusters) + first + video + last)
+    file = tmp_path / "cued.mkv"
+    file.write_bytes(element(0x1A45DFA3, string(0x4282, "matroska")) + segment)
+    assert [cue.content for cue in srt.parse(extract_tracks(file, 0)[0])] == [
+        "one",
+        "two",
+    ]
+
+
+def test_ass_to_srt():
+    assert ass_to_srt(r"{\an8\b1}top{\b0}") == r"{\an8}<b>top</b>"
+    assert ass_to_srt(r"a\Nb{\fs20}c") == "a\nbc"
+    assert ass_to_srt(r"{\bord2\blur3}Hello{\i1}x{\i0}") == "Hello<i>x</i>"
+    assert ass_to_srt(r"{\be1\shad2\b700}a{\s1}b{\s0}") == "a<s>b</s>"
+    assert ass_to_srt(r"{\i1}a{\i}b") == "<i>a</i>b"
@@ -1,3 +1,10 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from datetime import timedelta
+
+import pytest
+
 from srt import Subtitle
 from dualsrt.mux import (
     overlaps,
@@ -6,6 +13,13 @@ from dualsrt.mux import (
     strip_font,
     extract_position,
     dual_subtitles,
+    stacked_subtitles,
+    chunked_subtitles,
+    quiet_splits,
+    prepare_cues,
+    window_cues,
+    clip_window,
+    IntervalIndex,
 )
 
 
@@ -43,31 +57,57 @@ def test_combine_subtitles_only_primary():
     primary = [Subtitle(None, 1, 2, "a")]
     secondary = []
 
-    assert combine_subtitles(primary, secondary) == [[Subtitle(None, 1, 2, "a"), None]]
+    assert list(combine_subtitles(primary, secondary)) == [
+        [Subtitle(None, 1, 2, "a"), None]
+    ]
 
 
 def test_combine_subtitles_only_secondary():
     primary = []
     secondary = [Subtitle(None, 1, 2, "a")]
 
-    assert combine_subtitles(primary, secondary) == [[None, Subtitle(None, 1, 2, "a")]]
+    assert list(combine_subtitles(primary, secondary)) == [
+        [None, Subtitle(None, 1, 2, "a")]
+    ]
 
 
 def test_combine_subtitles_overlapping():
     primary = [Subtitle(None, 1, 3, "a")]
     secondary = [Subtitle(None, 2, 3, "b")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a"), None],
         [Subtitle(None, 2, 3, "a"), Subtitle(None, 2, 3, "b")],
     ]
 
 
+def test_combine_subtitles_overlapping_within_track():
+    primary = [Subtitle(None, 1, 10, "sign"), Subtitle(None, 2, 3, "hello")]
+    secondary = [Subtitle(None, 1, 5, "privet")]
+
+    # segments come in the order align_subtitles decides on, not by start
+    assert list(combine_subtitles(primary, secondary)) == [
+        [Subtitle(None, 1, 5, "sign"), Subtitle(None, 1, 5, "privet")],
+        [Subtitle(None, 5, 10, "sign"), None],
+        [Subtitle(None, 2, 3, "hello"), None],
+    ]
+
+
+def test_dual_subtitles_overlapping_within_track():
+    primary = [Subtitle(None, 0, 3, "p0")]
+    secondary = [Subtitle(None, 0, 4, "s0"), Subtitle(None, 1, 3, "s1")]
+
+    assert list(dual_subtitles(primary, secondary, {}, {}, 1)) == [
+        Subtitle(1, 0, 4, "p0\ns0\n."),
+        Subtitle(2, 1, 3, "s1\n."),
+    ]
+
+
 def test_combine_subtitles_included():
     primary = [Subtitle(None, 1, 4, "a")]
     secondary = [Subtitle(None, 2, 3, "b")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a"), None],
         [Subtitle(None, 2, 3, "a"), Subtitle(None, 2, 3, "b")],
         [Subtitle(None, 3, 4, "a"), None],
@@ -78,7 +118,7 @@ def test_combine_subtitles_not_intersect():
     primary = [Subtitle(None, 1, 2, "a")]
     secondary = [Subtitle(None, 3, 4, "b")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a"), None],
         [None, Subtitle(None, 3, 4, "b")],
     ]
@@ -88,7 +128,7 @@ def test_combine_subtitles_chain():
     primary = [Subtitle(None, 1, 3, "a1"), Subtitle(None, 4, 5, "a2")]
     secondary = [Subtitle(None, 2, 3, "b1")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a1"), None],
         [Subtitle(None, 2, 3, "a1"), Subtitle(None, 2, 3, "b1")],
         [Subtitle(None, 4, 5, "a2"), None],
@@ -99,7 +139,7 @@ def test_combine_subtitles_chain2():
     primary = [Subtitle(None, 1, 3, "a1"), Subtitle(None, 4, 6, "a2")]
     secondary = [Subtitle(None, 2, 3, "b1"), Subtitle(None, 5, 6, "b2")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a1"), None],
         [Subtitle(None, 2, 3, "a1"), Subtitle(None, 2, 3, "b1")],
         [Subtitle(None, 4, 5, "a2"), None],
@@ -115,7 +155,7 @@ def test_combine_subtitles_chain3():
     ]
     secondary = [Subtitle(None, 1, 4, "b1")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a1"), Subtitle(None, 1, 2, "b1")],
         [Subtitle(None, 2, 3, "a2"), Subtitle(None, 2, 3, "b1")],
         [Subtitle(None, 3, 4, "a3"), Subtitle(None, 3, 4, "b1")],
@@ -132,7 +172,7 @@ def test_combine_subtitles_chain4():
     ]
     secondary = [Subtitle(None, 3, 4, "b1")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a1"), None],
         [Subtitle(None, 2, 3, "a2"), None],
         [Subtitle(None, 3, 4, "a3"), Subtitle(None, 3, 4, "b1")],
@@ -151,7 +191,7 @@ def test_combine_subtitles_chain5():
     ]
     secondary = [Subtitle(None, 2, 5, "b1")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a1"), None],
         [Subtitle(None, 2, 3, "a2"), Subtitle(None, 2, 3, "b1")],
         [Subtitle(None, 3, 4, "a3"), Subtitle(None, 3, 4, "b1")],
@@ -168,7 +208,7 @@ def test_combine_subtitles_chain6():
     ]
     secondary = [Subtitle(None, 1, 6, "b1")]
 
-    assert combine_subtitles(primary, secondary) == [
+    assert list(combine_subtitles(primary, secondary)) == [
         [Subtitle(None, 1, 2, "a1"), Subtitle(None, 1, 2, "b1")],
         [None, Subtitle(None, 2, 3, "b1")],
         [Subtitle(None, 3, 4, "a3"), Subtitle(None, 3, 4, "b1")],
@@ -180,7 +220,7 @@ def test_combine_subtitles_chain6():
 def test_align_subtitles_aligned():
     subs = [[Subtitle(1, 2, 4, "a1"), Subtitle(1, 2, 4, "b1")]]
 
-    assert align_subtitles(subs, 1) == [
+    assert list(align_subtitles(subs, 1)) == [
         [Subtitle(1, 2, 4, "a1"), Subtitle(1, 2, 4, "b1")]
     ]
 
@@ -191,7 +231,7 @@ def test_align_subtitles_first_early():
         [Subtitle(1, 2, 4, "a1"), Subtitle(1, 2, 4, "b1")],
     ]
 
-    assert align_subtitles(subs, 1) == [
+    assert list(align_subtitles(subs, 1)) == [
         [Subtitle(1, 1, 4, "a1"), Subtitle(1, 1, 4, "b1")]
     ]
 
@@ -202,7 +242,7 @@ def test_align_subtitles_first_late():
         [Subtitle(1, 3, 4, "a1"), None],
     ]
 
-    assert align_subtitles(subs, 1) == [
+    assert list(align_subtitles(subs, 1)) == [
         [Subtitle(1, 1, 4, "a1"), Subtitle(1, 1, 4, "b1")]
     ]
 
@@ -214,7 +254,7 @@ def test_align_subtitles_fill_gap():
         [Subtitle(1, 6, 9, "a2"), Subtitle(1, 6, 9, "b2")],
     ]
 
-    assert align_subtitles(subs, 2) == [
+    assert list(align_subtitles(subs, 2)) == [
         [Subtitle(1, 1, 5, "a1"), Subtitle(1, 1, 5, "b1")],
         [Subtitle(1, 5, 9, "a2"), Subtitle(1, 5, 9, "b2")],
     ]
@@ -227,7 +267,7 @@ def test_align_subtitles_keeps_non_repeating_short_tilte():
         [None, Subtitle(2, 6, 9, "b3")],
     ]
 
-    assert align_subtitles(subs, 2) == [
+    assert list(align_subtitles(subs, 2)) == [
         [None, Subtitle(1, 1, 4, "b1")],
         [Subtitle(2, 4, 5, "a1"), Subtitle(1, 4, 5, "b2")],
         [None, Subtitle(2, 6, 9, "b3")],
@@ -241,7 +281,7 @@ def test_align_subtitles_extends_unique_short_title():
         [Subtitle(1, 5, 6, "a1"), None],
     ]
 
-    assert align_subtitles(subs, 1) == [
+    assert list(align_subtitles(subs, 1)) == [
         [Subtitle(1, 1, 4, "a1"), None],
         [Subtitle(1, 4, 6, "a1"), Subtitle(1, 4, 6, "b1")],
     ]
@@ -254,7 +294,7 @@ def test_align_subtitles_keeps_unique_short_title():
         [Subtitle(1, 5, 6, "a2"), None],
     ]
 
-    assert align_subtitles(subs, 1) == [
+    assert list(align_subtitles(subs, 1)) == [
         [Subtitle(1, 1, 4, "a1"), None],
         [Subtitle(1, 4, 5, "a1"), Subtitle(1, 4, 5, "b1")],
         [Subtitle(1, 5, 6, "a2"), None],
@@ -269,7 +309,7 @@ def test_align_subtitles_removes_series_of_shorts():
         [Subtitle(2, 9, 11, "a2"), None],
     ]
 
-    assert align_subtitles(subs, 3) == [
+    assert list(align_subtitles(subs, 3)) == [
         [Subtitle(1, 1, 7, "a1"), Subtitle(5, 1, 7, "b1")],
         [Subtitle(2, 8, 11, "a2"), None],
     ]
@@ -291,19 +331,273 @@ def test_extract_position():
 def test_dual_subtitles_simple():
     stream_a = [Subtitle(1, 2, 6, "a")]
     stream_b = [Subtitle(1, 4, 6, "b")]
-    res = dual_subtitles(stream_a, stream_b, {"color": "gray"}, {}, 2)
+    res = list(dual_subtitles(stream_a, stream_b, {"color": "gray"}, {}, 2))
     assert res == [Subtitle(1, 2, 6, '<font color="gray">a</font>\nb\n.')]
 
 
 def test_dual_subtitles_with_position():
     stream_a = [Subtitle(1, 2, 6, r"{\an8}a")]
     stream_b = [Subtitle(1, 4, 6, "b")]
-    res = dual_subtitles(stream_a, stream_b, {"color": "gray"}, {}, 2)
+    res = list(dual_subtitles(stream_a, stream_b, {"color": "gray"}, {}, 2))
     assert res == [Subtitle(1, 2, 6, '{\\an8}<font color="gray">a</font>\nb\n.')]
 
 
 def test_dual_subtitles_with_secondary_position():
     stream_a = [Subtitle(1, 2, 6, r"{\an8}a")]
     stream_b = [Subtitle(1, 4, 6, r"{\an8}b")]
-    res = dual_subtitles(stream_a, stream_b, {"color": "gray"}, {}, 2)
+    res = list(dual_subtitles(stream_a, stream_b, {"color": "gray"}, {}, 2))
     assert res == [Subtitle(1, 2, 6, '{\\an8}<font color="gray">a</font>\nb\n.')]
+
+
+def test_align_subtitles_empty():
+    assert list(align_subtitles([], 1)) == []
+
+
+def test_dual_subtitles_keeps_timedelta_resolution():
+    ms = timedelta(milliseconds=1)
+    stream_a = [
+        Subtitle(1, 0 * ms, 1000 * ms, "a"),
+        Subtitle(2, 1000 * ms, 1301 * ms, "a"),
+    ]
+    stream_b = [Subtitle(1, 0 * ms, 1301 * ms, "b")]
+    res = list(dual_subtitles(stream_a, stream_b, {}, {}, 400 * ms))
+    assert res == [Subtitle(1, 0 * ms, 1301 * ms, "a\nb\n.")]
+    assert stream_a[0].end == 1000 * ms
+
+
+def random_track(rng, count, overlapping=False):
+    subs, start = [], 0
+    for idx in range(count):
+        start += rng.choice((0, 0, 1, 3))
+        length = rng.randint(0 if overlapping else 1, 6)
+        subs.append(Subtitle(idx, start, start + length, f"c{rng.randint(0, 3)}"))
+        start += length - (rng.randint(0, length) if overlapping else 0)
+    return subs
+
+
+def combine_cases(rng):
+    cases = [
+        ([Subtitle(None, 1, 3, "a")], [Subtitle(None, 2, 3, "b")]),
+        ([Subtitle(None, 1, 4, "a")], []),
+        ([], [Subtitle(None, 1, 4, "b")]),
+        (
+            [Subtitle(None, 1, 2, "a1"), Subtitle(None, 3, 4, "a3")],
+            [Subtitle(None, 1, 6, "b1")],
+        ),
+    ]
+    cases += [(random_track(rng, 200), random_track(rng, 150)) for _ in range(20)]
+    cases += [(random_track(rng, 50, True), random_track(rng, 50)) for _ in range(5)]
+    return cases
+
+
+def test_combine_subtitles_numpy_matches_python():
+    pytest.importorskip("numpy")
+    for primary, secondary in combine_cases(random.Random(7)):
+        expected = list(combine_subtitles(primary, secondary))
+        assert list(combine_subtitles(primary, secondary, engine="numpy")) == expected
+
+
+def test_combine_subtitles_index_matches_python():
+    for primary, secondary in combine_cases(random.Random(7)):
+        expected = list(combine_subtitles(primary, secondary))
+        assert list(combine_subtitles(primary, secondary, engine="index")) == expected
+
+
+def test_dual_subtitles_sorts_aligned_segments():
+    # only the aligned segments are sorted, in srt.compose order
+    rng = random.Random(3)
+    for _ in range(20):
+        primary, secondary = (
+            [sub for sub in random_track(rng, 60, True) if sub.start < sub.end]
+            for _ in range(2)
+        )
+        segments = align_subtitles(
+            combine_subtitles(deepcopy(primary), deepcopy(secondary)), 2
+        )
+        expected = sorted(
+            ((prim or sec).start, (prim or sec).end) for prim, sec in segments
+        )
+        dual = dual_subtitles(primary, secondary, {}, {}, 2)
+        assert [(sub.start, sub.end) for sub in dual] == expected
+
+
+def test_combine_subtitles_three_tracks():
+    rng = random.Random(11)
+    for _ in range(20):
+        tracks = [random_track(rng, 60) for _ in range(3)]
+        points = sorted(
+            {t for track in tracks for s in track for t in (s.start, s.end)}
+        )
+        expected = []
+        for start, end in zip(points, points[1:]):
+            shown = [
+                next((s for s in track if s.start <= start and end <= s.end), None)
+                for track in tracks
+            ]
+            if any(shown):
+                expected.append(
+                    [s and Subtitle(s.index, start, end, s.content) for s in shown]
+                )
+        for engine in ("python", "index"):
+            assert list(combine_subtitles(*tracks, engine=engine)) == expected
+
+
+def test_overlaps_three():
+    sub1 = Subtitle(1, 1, 4, "a")
+    sub2 = Subtitle(2, 2, 6, "b")
+    assert overlaps(sub1, None, sub2) == [
+        [Subtitle(1, 1, 2, "a"), None, None],
+        [Subtitle(1, 2, 4, "a"), None, Subtitle(2, 2, 4, "b")],
+        [None, None, Subtitle(2, 4, 6, "b")],
+    ]
+    assert overlaps(sub1, None, None) == [[sub1, None, None]]
+
+
+def test_stacked_subtitles():
+    primary = [Subtitle(1, 0, 4000000, "{\\an8}Hello")]
+    secondary = [Subtitle(1, 0, 4000000, "Привет")]
+    third = [
+        Subtitle(1, 0, 2000000, "Hallo\nWelt"),
+        Subtitle(2, 2000000, 4000000, "Hi"),
+    ]
+    fonts = [{}, {"color": "gray"}, {"color": "yellow"}]
+    stacked = list(stacked_subtitles([primary, secondary, third], fonts))
+    assert [sub.content for sub in stacked] == [
+        '{\\an8}Hello\n<font color="gray">Привет\n.</font>\n'
+        '<font color="yellow">Hallo\nWelt</font>',
+        '{\\an8}Hello\n<font color="gray">Привет\n.</font>\n'
+        '<font color="yellow">Hi\n.</font>',
+    ]
+    pair = stacked_subtitles([primary, secondary], fonts[:2])
+    assert list(pair) == list(dual_subtitles(primary, secondary, *fonts[:2]))
+
+
+def test_interval_index():
+    rng = random.Random(5)
+    for count in (0, 1, 2, 3, 15, 16, 17, 100, 257):
+        subs = []
+        for idx in range(count):
+            start = rng.randint(0, 1000)
+            length = rng.choice((1, 2, 10, 300))
+            subs.append(Subtitle(idx, start, start + length, "c"))
+        index = IntervalIndex(subs)
+        ordered = sorted(subs, key=lambda sub: (sub.start, sub.end))
+        for _ in range(50):
+            start = rng.randint(-10, 1400)
+            end = start + rng.randint(1, 50)
+            assert index.overlapping(start, end) == [
+                sub for sub in ordered if sub.start < end and start < sub.end
+            ]
+            assert index.at(start) == [
+                sub for sub in ordered if sub.start <= start < sub.end
+            ]
+    second = timedelta(seconds=1)
+    index = IntervalIndex([Subtitle(1, second, 3 * second, "a")])
+    assert index.at(2 * second) == [Subtitle(1, second, 3 * second, "a")]
+    assert index.at(3 * second) == []
+
+
+def test_dual_subtitles_prepared_cues_match_subtitles():
+    rng = random.Random(3)
+    plain = random_track(rng, 100)
+    primary = [
+        Subtitle(
+            sub.index,
+            sub.start,
+            sub.end,
+            f'{{\\an8}}<font color="red">{sub.content}</font> ',
+        )
+        for sub in plain
+    ]
+    secondary = random_track(rng, 100)
+    prepared = prepare_cues(primary), prepare_cues(secondary)
+    expected = list(dual_subtitles(primary, secondary, {"color": "white"}, {}))
+    for _ in range(2):
+        assert list(dual_subtitles(*prepared, {"color": "white"}, {})) == expected
+    assert prepared[0][0].normalized == (plain[0].content, "{\\an8}")
+    same_content = [cue for cue in prepared[1] if cue.content == "c0"]
+    assert all(cue.normalized is same_content[0].normalized for cue in same_content)
+
+
+def test_window_cues():
+    seconds = [timedelta(seconds=n) for n in range(200)]
+    subs = [Subtitle(n, seconds[n * 5], seconds[n * 5 + 4], str(n)) for n in range(40)]
+    window = window_cues(subs, seconds[100], seconds[120])
+    assert [sub.index for sub in window] == list(range(14, 30))
+    assert window_cues(subs, end=seconds[10]) == subs[:8]
+    assert window_cues(subs, seconds[190]) == subs[32:]
+    assert window_cues([], seconds[1], seconds[2]) == []
+    # still on screen in the window, though it started before the lookback
+    long = Subtitle(99, seconds[100], seconds[160], "long")
+    window = window_cues([subs[0], long, subs[39]], seconds[140], seconds[150])
+    assert window == [long]
+
+
+def test_clip_window():
+    seconds = [timedelta(seconds=n) for n in range(100)]
+    subs = [
+        Subtitle(1, seconds[40], seconds[45], "before"),
+        Subtitle(2, seconds[48], seconds[52], "across"),
+        Subtitle(3, seconds[55], seconds[60], "inside"),
+        Subtitle(4, seconds[68], seconds[75], "after"),
+    ]
+    assert list(clip_window(deepcopy(subs), seconds[50], seconds[70])) == [
+        Subtitle(2, seconds[0], seconds[2], "across"),
+        Subtitle(3, seconds[5], seconds[10], "inside"),
+        Subtitle(4, seconds[18], seconds[20], "after"),
+    ]
+    kept = clip_window(deepcopy(subs), seconds[50], seconds[70], keep_times=True)
+    assert [(sub.start, sub.end) for sub in kept] == [
+        (seconds[50], seconds[52]),
+        (seconds[55], seconds[60]),
+        (seconds[68], seconds[70]),
+    ]
+    assert list(clip_window(deepcopy(subs), seconds[60])) == [
+        Subtitle(4, seconds[8], seconds[15], "after")
+    ]
+    # cut to the same start, the shorter one comes first like in srt.compose
+    overlapping = [
+        Subtitle(1, seconds[40], seconds[60], "long"),
+        Subtitle(2, seconds[45], seconds[55], "short"),
+    ]
+    assert list(clip_window(overlapping, seconds[50])) == [
+        Subtitle(2, seconds[0], seconds[5], "short"),
+        Subtitle(1, seconds[0], seconds[10], "long"),
+    ]
+
+
+def gapped_track(rng, count, tag):
+    subs, start = [], 0
+    for idx in range(count):
+        start += rng.choice((0, 1, 5, 20))
+        length = rng.randint(1, 10)
+        subs.append(Subtitle(idx, start, start + length, f"{tag}{rng.randint(0, 3)}"))
+        start += length
+    return subs
+
+
+def test_quiet_splits():
+    primary = [Subtitle(1, 0, 10, "a"), Subtitle(2, 20, 30, "b")]
+    secondary = [Subtitle(1, 5, 12, "c"), Subtitle(2, 25, 40, "d")]
+    assert quiet_splits([primary, secondary], 2, 1) == [20]
+    assert quiet_splits([primary, secondary], 2, 2) == []  # 10 to 12 is too short
+    assert quiet_splits([primary, secondary], 1, 1) == []
+    assert quiet_splits([primary, []], 2, 1) == []
+    overlapping = [Subtitle(1, 0, 10, "a"), Subtitle(2, 5, 30, "b")]
+    assert quiet_splits([overlapping, secondary], 2, 1) == []
+
+
+def test_chunked_subtitles_match_dual_subtitles():
+    rng = random.Random(5)
+    splits = 0
+    with ThreadPoolExecutor(3) as pool:
+        for _ in range(30):
+            primary, secondary = gapped_track(rng, 80, "a"), gapped_track(rng, 60, "b")
+            chunks = rng.randint(2, 6)
+            splits += len(quiet_splits([primary, secondary], chunks, 3))
+            expected = list(dual_subtitles(primary, secondary, {}, {}, 3))
+            chunked = chunked_subtitles(
+                [primary, secondary], [{}, {}], pool, chunks, min_len=3
+            )
+            assert list(chunked) == expected
+    assert splits > 30
@@ -0,0 +1,68 @@
+from dualsrt import pipeline
+from dualsrt.cli import run_batch
+from dualsrt.pipeline import run
+from dualsrt.stats import Stats
+
+
+def outputs(tmp_path):
+    return {path.name: path.read_text() for path in tmp_path.glob("*.srt")}
+
+
+def test_pipeline_matches_batch(tmp_path, pair, fake_library):
+    videos = fake_library(3)
+    arguments = {**pair, "secondary_font": {"color": "gray"}, "force": True}
+    assert run_batch(videos, 1, arguments) == [(video, None) for video in videos]
+    expected = outputs(tmp_path)
+    assert len(expected) == 3
+    for path in tmp_path.glob("*.srt"):
+        path.unlink()
+    results = run(videos, arguments, mux_jobs=2)
+    assert results == [(video, None) for video in videos]
+    assert outputs(tmp_path) == expected
+
+
+def test_pipeline_uses_cache_and_reports_errors(
+    tmp_path, pair, video_cache, fake_library
+):
+    videos = fake_library(1)
+    missing = tmp_path / "missing.mkv"
+    arguments = {**pair, "cache": video_cache, "srt_io": "builtin", "force": True}
+    results = run([missing, *videos], arguments, probe_jobs=1, extract_jobs=1)
+    assert results[0][0] == missing and results[0][1]
+    assert results[1] == (videos[0], None)
+    assert video_cache.load_track(videos[0], 2) is not None
+
+
+def test_pipeline_stats_and_planned_streams(tmp_path, monkeypatch, pair, fake_library):
+    videos = fake_library(2)
+    streams = {
+        videos[0]: {
+            "eng": [{"index": 1, "codec_name": "subrip", "tags": {"language": "eng"}}],
+            "rus": [{"index": 2, "codec_name": "subrip", "tags": {"language": "rus"}}],
+        }
+    }
+    probed = []
+
+    async def find_subtitles(video, *args):
+        probed.append(video)
+        return await probe(video, *args)
+
+    probe = pipeline.find_subtitles
+    monkeypatch.setattr(pipeline, "find_subtitles", find_subtitles)
+    stats = Stats()
+    results = run(videos, pair, stats=stats, streams=streams)
+    assert results == [(video, None) for video in videos]
+    assert probed == [videos[1]]
+    for video in videos:
+        stages = stats.files[str(video)]
+        assert set(stages) == {
+            "total",
+            "probe",
+            "extract",
+            "parse",
+            "normalize",
+            "mux",
+            "write",
+        }
+        assert stages["parse"]["cues_out"] == 100
+        assert stages["mux"]["cues_in"] == 100
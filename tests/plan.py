@@ -0,0 +1,45 @@
+import json
+import os
+
+from benchmarks.synthetic import fake_video, synthetic_pair
+from dualsrt import extract
+from dualsrt.cli import main
+from dualsrt.plan import stream_bytes
+
+
+def test_stream_bytes():
+    assert stream_bytes({"tags": {"NUMBER_OF_BYTES-eng": "1234"}}) == 1234
+    assert stream_bytes({"tags": {"NUMBER_OF_BYTES": "56"}}) == 56
+    assert stream_bytes({"tags": {"language": "eng"}}) is None
+
+
+def test_plan_and_run(tmp_path, monkeypatch, fake_ffmpeg):
+    primary, secondary = synthetic_pair(20, 1)
+    video = fake_video(tmp_path / "video.mkv", {"eng": [primary], "rus": [secondary]})
+    media = json.loads(video.read_text())
+    media["streams"][0]["tags"]["NUMBER_OF_BYTES-eng"] = "1000"
+    video.write_text(json.dumps(media))
+    other = fake_video(tmp_path / "other.mkv", {"eng": [primary]})
+    plan_file = tmp_path / "plan.json"
+    argv = ["plan", "eng", "rus", str(video), str(other), "-o", str(plan_file)]
+    assert main(argv + ["--no-cache"]) == 0
+    plan = json.loads(plan_file.read_text())
+    assert plan["fields"]["primary_language"] == "eng"
+    planned, empty = plan["files"]
+    assert [s["index"] for s in planned["streams"]["rus"]] == [2]
+    output = tmp_path / "video.eng.dual_eng_rus.srt"
+    assert planned["outputs"] == [
+        {"path": str(output), "streams": [1, 2], "exists": False}
+    ]
+    assert (planned["estimated_bytes"], planned["unsized_streams"]) == (1000, 1)
+    assert not planned["up_to_date"] and empty["outputs"] == []
+
+    def probe(*args, **kwargs):
+        raise AssertionError("probed a planned video")
+
+    monkeypatch.setattr(extract, "probe_subtitles", probe)
+    assert main(["run", "--plan", str(plan_file), "--no-cache"]) == 0
+    assert output.exists()
+    # changed videos are probed again
+    os.utime(video, ns=(0, 0))
+    assert main(["run", "--plan", str(plan_file), "--no-cache", "--force"]) == 1
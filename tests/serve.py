@@ -0,0 +1,62 @@
+from threading import Event, Thread
+
+import pytest
+
+from benchmarks.synthetic import fake_video, synthetic_pair
+from dualsrt.cli import main
+from dualsrt.serve import serve, submit, tcp_address
+
+
+def test_tcp_address_is_loopback():
+    assert tcp_address("http://127.0.0.1:8080") == ("127.0.0.1", 8080)
+    assert tcp_address("http://localhost:8080") == ("localhost", 8080)
+    for address in ("http://0.0.0.0:8080", "http://example.com:80", "http://[::1]"):
+        with pytest.raises(ValueError):
+            tcp_address(address)
+
+
+@pytest.fixture
+def server(tmp_path, fake_ffmpeg):
+    address = str(tmp_path / "dualsrt.sock")
+    started, servers = Event(), []
+
+    def ready(server):
+        servers.append(server)
+        started.set()
+
+    thread = Thread(target=serve, args=(address, 1, None, ready))
+    thread.start()
+    started.wait(10)
+    yield address
+    servers[0].shutdown()
+    thread.join()
+
+
+def test_serve_jobs(tmp_path, server):
+    primary, secondary = synthetic_pair(20, 1)
+    video = fake_video(tmp_path / "video.mkv", {"eng": [primary], "rus": [secondary]})
+    job = {"video": str(video), "primary_language": "eng", "secondary_language": "rus"}
+    result = submit(server, job)
+    assert result["error"] is None and not result["skipped"]
+    assert result["outputs"] == [str(tmp_path / "video.eng.dual_eng_rus.srt")]
+    assert result["stats"]["mux"]["cues_in"] == 40
+    assert submit(server, job)["skipped"]
+    with pytest.raises(ValueError):
+        submit(server, {**job, "colour": "gray"})
+
+
+def test_client_mode(tmp_path, server, capsys):
+    primary, secondary = synthetic_pair(20, 1)
+    video = fake_video(tmp_path / "video.mkv", {"eng": [primary], "rus": [secondary]})
+    missing = tmp_path / "missing.mkv"
+    missing.write_text("{}")
+    assert main(["eng", "rus", str(video), str(missing), "--server", server]) == 1
+    assert (tmp_path / "video.eng.dual_eng_rus.srt").exists()
+    assert capsys.readouterr().err.splitlines()[-1] == "1 succeeded, 1 failed"
+
+
+def test_non_loopback_server_is_rejected(tmp_path):
+    with pytest.raises(SystemExit):
+        main(
+            ["eng", "rus", str(tmp_path / "video.mkv"), "--server", "http://0.0.0.0:80"]
+        )
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+import srt
+from srt import Subtitle
+
+from dualsrt.mux import dual_subtitles
+from dualsrt.srtio import parse, read_text, write_srt
+
+SAMPLE = (
+    "1\n00:00:01,000 --> 00:00:02,500\nfirst\nline\n\n"
+    "2\n00:00:03,000 --> 00:00:04,000 X1:10 X2:20\n{\\an8}second\n\n"
+    "3\n01:02:03,004 --> 01:02:05,000\nwith\n\nblank line\n\n"
+)
+
+
+def as_subtitles(cues):
+    return [(c.start, c.end, c.content) for c in cues]
+
+
+def expected(text):
+    return [
+        (
+            s.start // timedelta(microseconds=1),
+            s.end // timedelta(microseconds=1),
+            s.content,
+        )
+        for s in srt.parse(text)
+    ]
+
+
+def test_parse_matches_srt():
+    assert as_subtitles(parse(SAMPLE)) == expected(SAMPLE)
+
+
+def test_parse_bytes_with_bom_and_crlf():
+    data = ("\ufeff" + SAMPLE).replace("\n", "\r\n").encode()
+    assert as_subtitles(parse(memoryview(data))) == expected(SAMPLE)
+
+
+def test_parse_malformed_timestamps():
+    text = "1\n00:00:01.5 -> 00:00:02\nno ms\n2\n0:0:3:250-->0:0:4,000\nnext\n"
+    assert as_subtitles(parse(text)) == [
+        (1_005_000, 2_000_000, "no ms"),
+        (3_250_000, 4_000_000, "next"),
+    ]
+
+
+def test_write_srt_matches_compose(tmp_path):
+    subs = [
+        Subtitle(1, timedelta(seconds=1), timedelta(seconds=2), "a\n\nb"),
+        Subtitle(2, timedelta(seconds=2), timedelta(seconds=2), "zero length"),
+        Subtitle(3, timedelta(hours=30), timedelta(hours=30, milliseconds=5), "c"),
+    ]
+    output = tmp_path / "out.srt"
+    write_srt(output, subs)
+    assert output.read_text() == srt.compose(subs)
+    assert [p.name for p in tmp_path.iterdir()] == ["out.srt"]
+
+
+def test_write_srt_overlapping_primary(tmp_path):
+    seconds = [timedelta(seconds=n) for n in range(11)]
+    primary = list(
+        parse("1\n0:0:1,0 --> 0:0:10,0\nsign\n\n2\n0:0:2,0 --> 0:0:3,0\nhello\n")
+    )
+    secondary = [Subtitle(None, seconds[1], seconds[5], "privet")]
+    output = tmp_path / "out.srt"
+    write_srt(output, dual_subtitles(primary, secondary, {}, {}))
+    assert output.read_text() == srt.compose(dual_subtitles(primary, secondary, {}, {}))
+
+
+def test_read_text(tmp_path):
+    path = tmp_path / "sidecar.srt"
+    path.write_bytes(b"")
+    assert read_text(path) == ""
+    path.write_bytes(("\ufeff" + SAMPLE).encode())
+    assert read_text(path) == SAMPLE
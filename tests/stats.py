@@ -0,0 +1,70 @@
+import json
+import time
+
+from dualsrt.cli import run_batch
+from dualsrt.stats import NO_STATS, Stats
+
+
+def test_stats_per_stage(pair, video_cache, cached_video):
+    stats = Stats()
+    arguments = {**pair, "cache": video_cache}
+    assert run_batch([cached_video], 1, arguments, stats=stats) == [
+        (cached_video, None)
+    ]
+    stages = stats.files[str(cached_video)]
+    assert set(stages) == {
+        "total",
+        "probe",
+        "extract",
+        "parse",
+        "normalize",
+        "mux",
+        "write",
+    }
+    assert stages["probe"]["streams"] == 2
+    track = video_cache.load_track(cached_video, 2)
+    assert stages["extract"]["bytes_read"] == 2 * len(track)
+    assert stages["parse"]["cues_out"] == 4
+    assert stages["mux"]["cues_in"] == 4
+    assert stages["mux"]["cues_out"] == 2
+    assert stages["write"]["bytes_written"] > 0
+    assert all(record["seconds"] >= 0 for record in stages.values())
+    assert stages["total"]["peak_rss_bytes"] > 0
+    assert json.loads(json.dumps(stats.report()))["totals"]["mux"]["cues_out"] == 2
+
+
+def test_stage_inside_takes_time_out_of_enclosing_stage():
+    stats = Stats()
+    with stats.stage("video", "extract") as record:
+        parse = stats.parser("video", lambda text: time.sleep(0.05) or [text], record)
+        assert parse("text") == ["text"]
+    stages = stats.files["video"]
+    assert stages["parse"]["seconds"] >= 0.05 > stages["extract"]["seconds"]
+
+
+def test_stats_from_worker_processes(tmp_path, pair):
+    videos = [tmp_path / f"missing{i}.mkv" for i in range(2)]
+    stats = Stats()
+    run_batch(videos, 2, pair, stats=stats)
+    assert set(stats.files) == {str(video) for video in videos}
+
+
+def test_no_stats_leaves_stages_untouched():
+    items = iter([1, 2])
+    assert NO_STATS.timed("video", "mux", items) is items
+    assert NO_STATS.parser("video", list) is list
+    with NO_STATS.stage("video", "probe") as record:
+        record["streams"] = 1
+    assert NO_STATS.files == {}
+
+
+def test_prometheus_textfile(tmp_path):
+    stats = Stats()
+    with stats.stage('a "b".mkv', "probe"):
+        pass
+    stats.add('a "b".mkv', "probe", streams=2)
+    stats.write_prometheus(tmp_path / "dualsrt.prom")
+    lines = (tmp_path / "dualsrt.prom").read_text().splitlines()
+    assert "# TYPE dualsrt_stage_streams gauge" in lines
+    assert 'dualsrt_stage_streams{file="a \\"b\\".mkv",stage="probe"} 2' in lines
+    assert list(tmp_path.iterdir()) == [tmp_path / "dualsrt.prom"]
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from dualsrt.mux import Cue
+from dualsrt.sync import estimate_timing, retime, sync_cues
+
+pytest.importorskip("numpy")
+
+NTSC_FILM = 24000 / 1001
+
+
+def shifted_track(seed, scale, offset, count=400):
+    # a primary track and the secondary one of a release with other timing
+    rng = random.Random(seed)
+    primary, secondary, time = [], [], 0
+    for idx in range(count):
+        time += rng.randint(500_000, 6_000_000)
+        length = rng.randint(800_000, 4_000_000)
+        primary.append(Cue(time, time + length, f"p{idx}", None))
+        jitter = rng.randint(-80_000, 80_000)
+        if rng.random() > 0.1:
+            start = round((time - offset) / scale) + jitter
+            end = round((time + length - offset) / scale) + jitter
+            secondary.append(Cue(start, end, f"s{idx}", None))
+        time += length
+    return primary, secondary
+
+
+@pytest.mark.parametrize("offset", [3_400_000, -12_000_000])
+def test_estimate_offset(offset):
+    primary, secondary = shifted_track(1, 1.0, offset)
+    scale, found = estimate_timing(primary, secondary)
+    assert scale == 1.0 and abs(found - offset) < 20_000
+
+
+@pytest.mark.parametrize("scale", [25 / NTSC_FILM, NTSC_FILM / 25])
+def test_estimate_drift(scale):
+    primary, secondary = shifted_track(2, scale, 1_500_000)
+    found_scale, found_offset = estimate_timing(primary, secondary, drift=True)
+    assert abs(found_scale - scale) < 1e-5
+    assert abs(found_offset - 1_500_000) < 20_000
+
+
+def test_sync_cues():
+    primary, secondary = shifted_track(3, 1.0, 2_000_000)
+    synced = sync_cues(primary, secondary)
+    assert [cue.content for cue in synced] == [cue.content for cue in secondary]
+    errors = [abs(cue.start - primary[int(cue.content[1:])].start) for cue in synced]
+    assert max(errors) <= 100_000
+    too_few = secondary[:5]
+    assert sync_cues(primary[:5], too_few) is too_few
+    assert sync_cues([], secondary) is secondary
+
+
+def test_retime_drops_cues_before_zero():
+    cues = [Cue(0, 10, "a", None), Cue(20, 40, "b", None), Cue(50, 60, "c", None)]
+    retimed = retime(cues, 2.0, -60)
+    assert [(cue.start, cue.end, cue.content) for cue in retimed] == [
+        (0, 20, "b"),
+        (40, 60, "c"),
+    ]
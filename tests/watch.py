@@ -0,0 +1,69 @@
+import time
+from threading import Event, Thread
+
+import pytest
+
+from dualsrt.watch import Debouncer, PollingWatcher, watch
+
+
+def test_debouncer_waits_for_writes_to_settle(tmp_path):
+    now = [0.0]
+    video = tmp_path / "video.mkv"
+    video.write_bytes(b"part")
+    debouncer = Debouncer(2, clock=lambda: now[0])
+    debouncer.touch(video)
+    now[0] = 1
+    assert debouncer.ready() == []
+    video.write_bytes(b"partial video")
+    now[0] = 2
+    assert debouncer.ready() == []
+    assert debouncer.timeout() == 2
+    now[0] = 4
+    assert debouncer.ready() == [video]
+    assert debouncer.timeout() is None
+
+
+def test_debouncer_forgets_deleted_files(tmp_path):
+    debouncer = Debouncer(0)
+    debouncer.touch(tmp_path / "gone.mkv")
+    assert debouncer.ready() == []
+    assert debouncer.pending == {}
+
+
+def test_polling_watcher_reports_new_and_changed_videos(tmp_path):
+    (tmp_path / "old.mkv").write_bytes(b"old")
+    watcher = PollingWatcher([tmp_path], interval=0)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "new.mkv").write_bytes(b"new")
+    (tmp_path / "notes.txt").write_text("not a video")
+    assert watcher.changes(0) == [tmp_path / "sub" / "new.mkv"]
+    assert watcher.changes(0) == []
+
+
+@pytest.mark.parametrize("poll_interval", [None, 0.05])
+def test_watch_processes_arriving_videos(
+    tmp_path, poll_interval, pair, video_cache, cache_subtitles
+):
+    library = tmp_path / "library"
+    library.mkdir()
+    video = library / "video.mkv"
+    stop, results = Event(), []
+
+    def report(video, error):
+        results.append((video, error))
+        stop.set()
+
+    arguments = {**pair, "cache": video_cache}
+    options = dict(settle=0.3, poll_interval=poll_interval, stop=stop, report=report)
+    thread = Thread(target=watch, args=([library], 1, arguments), kwargs=options)
+    thread.start()
+    try:
+        time.sleep(0.2)
+        video.write_bytes(b"video")
+        cache_subtitles(video)
+        thread.join(10)
+    finally:
+        stop.set()
+        thread.join()
+    assert results == [(video, None)]
+    assert (library / "video.eng.dual_eng_rus.srt").exists()